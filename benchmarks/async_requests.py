@@ -0,0 +1,95 @@
+"""
+Requests per second of aquery under many concurrent callers, against fake
+clients that answer after a fixed latency: an asyncio client, a synchronous
+client on the thread pool, and the synchronous query run one at a time.
+
+    $ python -m benchmarks.async_requests [CALLERS] [LATENCY_MS] [LIMIT]
+"""
+
+import asyncio
+import sys
+from time import perf_counter, sleep
+
+from pydiggy import Node, aio, aquery, query
+
+RESPONSE = (
+    b'{"q": [{"uid": "0x1", "_type": "BenchRegion", "name": "Portugal"}]}'
+)
+
+
+class BenchRegion(Node):
+    name: str
+
+
+class Response:
+    json = RESPONSE
+
+
+class Transaction:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def query(self, *args, **kwargs):
+        sleep(self.latency)
+        return Response()
+
+    def discard(self):
+        pass
+
+
+class NativeTransaction(Transaction):
+    async def query(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return Response()
+
+    async def discard(self):
+        pass
+
+
+class Client:
+    transaction = Transaction
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def txn(self, read_only=False):
+        return self.transaction(self.latency)
+
+    def query(self, *args, **kwargs):
+        return self.txn().query(*args, **kwargs)
+
+
+class AsyncClient(Client):
+    transaction = NativeTransaction
+
+
+def measure(client, callers):
+    async def run():
+        await asyncio.gather(*(aquery("{}", client) for _ in range(callers)))
+
+    start = perf_counter()
+    asyncio.run(run())
+    return callers / (perf_counter() - start)
+
+
+def run(callers=1000, latency_ms=5, limit=64):
+    latency = latency_ms / 1000
+    aio.set_concurrency(limit)
+
+    print(f"{callers} callers, {latency_ms}ms latency, limit {limit}")
+    native = measure(AsyncClient(latency), callers)
+    print(f"    {'asyncio client':<20} {native:>9,.0f} requests/s")
+    threaded = measure(Client(latency), callers)
+    print(f"    {'thread pool':<20} {threaded:>9,.0f} requests/s")
+
+    client = Client(latency)
+    number = max(1, min(callers, int(0.5 / latency)))
+    start = perf_counter()
+    for _ in range(number):
+        query("{}", client)
+    blocking = number / (perf_counter() - start)
+    print(f"    {'blocking query':<20} {blocking:>9,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
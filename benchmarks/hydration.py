@@ -0,0 +1,81 @@
+"""
+Construction and hydration cost of Node instances.
+
+The "uncached" figures force the annotation table to be compiled again for
+every instance, which is how Node.__init__ and Node._hydrate used to behave.
+
+    $ python -m benchmarks.hydration [NUM_NODES]
+"""
+
+from __future__ import annotations
+
+import sys
+from timeit import timeit
+from typing import List
+
+from pydiggy import Node, hydrate
+
+
+class Region(Node):
+    area: int
+    population: int
+    name: str
+    borders: List[Region]
+
+
+def make_payload(num_nodes):
+    return {
+        "allRegions": [
+            {
+                "uid": hex(i + 1),
+                "_type": "Region",
+                "name": f"Region {i}",
+                "area": i,
+                "population": i * 10,
+                "borders": [
+                    {"uid": hex(((i + j) % num_nodes) + 1), "_type": "Region"}
+                    for j in range(1, 4)
+                ],
+            }
+            for i in range(num_nodes)
+        ]
+    }
+
+
+def uncached(cls):
+    return cls._compile_type_hints()[1]
+
+
+def uncached_predicates(cls):
+    return cls._compile_type_hints()[2]
+
+
+def construct(num_nodes):
+    for i in range(num_nodes):
+        Region(uid=i + 1, name="Portugal", area=i, population=i)
+
+
+def run(num_nodes=10_000):
+    print(f"{num_nodes} nodes")
+    cached = timeit(lambda: construct(num_nodes), number=1)
+    print(f"    construct (cached):   {cached:.3f}s")
+
+    Region._get_annotations = classmethod(uncached)
+    Region._get_predicates = classmethod(uncached_predicates)
+    try:
+        before = timeit(lambda: construct(num_nodes), number=1)
+        print(f"    construct (uncached): {before:.3f}s")
+        payload = make_payload(num_nodes)
+        before = timeit(lambda: hydrate(payload), number=1)
+        print(f"    hydrate (uncached):   {before:.3f}s")
+    finally:
+        del Region._get_annotations
+        del Region._get_predicates
+
+    payload = make_payload(num_nodes)
+    cached = timeit(lambda: hydrate(payload), number=1)
+    print(f"    hydrate (cached):     {cached:.3f}s")
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
@@ -0,0 +1,72 @@
+"""
+Decode and encode times for every installed JSON codec, on a query response
+and on exploded nodes.
+
+    $ python -m benchmarks.json_codecs [NUM_NODES]
+"""
+
+import sys
+from timeit import timeit
+
+from pydiggy import codec
+
+
+def make_response(num_nodes):
+    return {
+        "allRegions": [
+            {
+                "uid": hex(i + 1),
+                "_type": "Region",
+                "name": f"Region {i}",
+                "area": i,
+                "population": i * 10.5,
+                "borders": [
+                    {
+                        "uid": hex(((i + j) % num_nodes) + 1),
+                        "_type": "Region",
+                        "name": f"Region {(i + j) % num_nodes}",
+                        "borders|distance": j * 1.5,
+                    }
+                    for j in range(1, 4)
+                ],
+            }
+            for i in range(num_nodes)
+        ]
+    }
+
+
+def make_exploded(num_nodes):
+    return [
+        {
+            "_type": "Region",
+            "uid": i,
+            "name": f"Region {i}",
+            "borders": [
+                {"_type": "Region", "uid": j, "name": f"Region {j}"}
+                for j in range(3)
+            ],
+        }
+        for i in range(num_nodes)
+    ]
+
+
+def run(num_nodes=20_000, number=5):
+    response = codec.dumps(make_response(num_nodes), codec="json").encode()
+    exploded = make_exploded(num_nodes)
+
+    print(f"{num_nodes} nodes, {len(response) / 1024:.0f} KiB response")
+    print(f"    {'codec':<10} {'loads':>8} {'dumps':>8}")
+    for name in sorted(codec.CODECS):
+        loads = timeit(
+            lambda: codec.loads(response, codec=name), number=number
+        )
+        dumps = timeit(
+            lambda: codec.dumps(exploded, codec=name), number=number
+        )
+        print(
+            f"    {name:<10} {loads / number:>7.3f}s {dumps / number:>7.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
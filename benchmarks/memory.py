@@ -0,0 +1,71 @@
+"""
+Memory held by hydrated Node instances, with and without compact storage,
+scaled to 1M nodes.
+
+    $ python -m benchmarks.memory [NUM_NODES]
+"""
+
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+
+from pydiggy import Node, hydrate
+from pydiggy.registry import InstanceRegistry
+
+
+class Region(Node):
+    area: int
+    population: int
+    name: str
+
+
+class CompactRegion(Node, compact=True):
+    area: int
+    population: int
+    name: str
+
+
+def make_payload(name, num_nodes):
+    return {
+        "q": [
+            {
+                "uid": hex(i + 1),
+                "_type": name,
+                "name": "Region",
+                "area": 1,
+                "population": 1,
+            }
+            for i in range(num_nodes)
+        ]
+    }
+
+
+def measure(node, num_nodes):
+    payload = make_payload(node.__name__, num_nodes)
+    node._instances = InstanceRegistry()
+    gc.collect()
+
+    tracemalloc.start()
+    data = hydrate(payload)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # The output list and the identity map are not part of the per node cost
+    size -= sys.getsizeof(data["q"]) + sys.getsizeof(node._instances._data)
+    node._instances = InstanceRegistry()
+    del data
+    return size
+
+
+def run(num_nodes=100_000):
+    scale = 1_000_000 / num_nodes
+    print(f"{num_nodes} nodes, scaled to 1M")
+    for node in (Region, CompactRegion):
+        size = measure(node, num_nodes) * scale
+        print(f"    {node.__name__:<14} {size / 1024 ** 2:>8.1f} MiB")
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
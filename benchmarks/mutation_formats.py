@@ -0,0 +1,62 @@
+"""
+Serialization time and payload size of N-Quad mutations against JSON
+(set_json) mutations, for nodes with facet heavy edges.
+
+    $ python -m benchmarks.mutation_formats [NUM_NODES] [NUM_EDGES]
+"""
+
+from __future__ import annotations
+
+import sys
+from time import perf_counter
+from typing import List
+
+from pydiggy import Facets, Node, generate_json_mutation, generate_mutation
+from pydiggy.codec import CODECS, dumps
+
+
+class Station(Node):
+    name: str
+    lines: int
+    elevation: float
+    links: List[Station]
+
+
+def stage(num_nodes, num_edges):
+    Station._reset()
+    stations = []
+    for i in range(num_nodes):
+        station = Station(name=f"Station {i}", lines=i % 7, elevation=i / 3)
+        station.links = [
+            Facets(stations[-j], distance=j * 1.5, line=f"L{j}", night=j % 2)
+            for j in range(1, min(num_edges, len(stations)) + 1)
+        ]
+        station.stage()
+        stations.append(station)
+
+
+def run(num_nodes=100_000, num_edges=5):
+    stage(num_nodes, num_edges)
+    start = perf_counter()
+    payload = generate_mutation().encode("utf-8")
+    elapsed = perf_counter() - start
+    print(
+        f"{'nquads':>12}: {elapsed:.2f}s, {len(payload) / 2 ** 20:.1f} MiB"
+    )
+    del payload
+
+    for codec in sorted(CODECS):
+        stage(num_nodes, num_edges)
+        start = perf_counter()
+        payload = dumps(generate_json_mutation(), codec=codec)
+        payload = payload.encode("utf-8")
+        elapsed = perf_counter() - start
+        print(
+            f"{'json/' + codec:>12}: {elapsed:.2f}s, "
+            f"{len(payload) / 2 ** 20:.1f} MiB"
+        )
+        del payload
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
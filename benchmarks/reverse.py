@@ -0,0 +1,43 @@
+"""
+Cost of maintaining reverse edges on a hub node, as edges pointing at it are
+added and then removed again.
+
+    $ python -m benchmarks.reverse [NUM_EDGES]
+"""
+
+from __future__ import annotations
+
+import sys
+from time import perf_counter
+
+from pydiggy import Node, reverse
+
+
+class Person(Node):
+    parent: Person = reverse(name="children", many=True)
+
+
+def run(num_edges=100_000):
+    for size in (num_edges // 10, num_edges):
+        hub = Person(uid=1)
+        people = [Person(uid=i + 2) for i in range(size)]
+
+        start = perf_counter()
+        for person in people:
+            person.parent = hub
+        added = perf_counter() - start
+
+        start = perf_counter()
+        for person in people:
+            person.parent = None
+        removed = perf_counter() - start
+
+        assert len(hub.children) == 0
+        print(
+            f"{size:>8} edges: add {added:.3f}s, remove {removed:.3f}s "
+            f"({(added + removed) / size * 1e6:.2f}us per edge)"
+        )
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
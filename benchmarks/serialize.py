@@ -0,0 +1,72 @@
+"""
+Throughput of serializing staged nodes into N-Quads, through
+generate_mutation and write_mutation.
+
+    $ python -m benchmarks.serialize [NUM_NODES]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from datetime import datetime
+from time import perf_counter
+from typing import List
+
+from pydiggy import Facets, Node, generate_mutation, write_mutation
+
+
+class City(Node):
+    name: str
+    population: int
+    area: float
+    capital: bool
+    founded: datetime
+    twins: List[City]
+
+
+def stage(num_nodes):
+    City._reset()
+    founded = datetime(1900, 1, 1)
+    previous = None
+    for i in range(num_nodes):
+        city = City(
+            name=f"City {i}",
+            population=i,
+            area=i / 3,
+            capital=i % 2 == 0,
+            founded=founded,
+        )
+        if previous is not None:
+            city.twins = [Facets(previous, distance=i)]
+        city.stage()
+        previous = city
+
+
+def run(num_nodes=1_000_000):
+    stage(num_nodes)
+    start = perf_counter()
+    mutation = generate_mutation()
+    elapsed = perf_counter() - start
+    lines = mutation.count("\n") + 1
+    del mutation
+    print(
+        f"generate_mutation: {num_nodes} nodes, {lines} lines in "
+        f"{elapsed:.2f}s ({num_nodes / elapsed:,.0f} nodes/s, "
+        f"{lines / elapsed:,.0f} lines/s)"
+    )
+
+    stage(num_nodes)
+    with open(os.devnull, "wb") as fp:
+        start = perf_counter()
+        lines = write_mutation(fp)
+        elapsed = perf_counter() - start
+    print(
+        f"write_mutation:    {num_nodes} nodes, {lines} lines in "
+        f"{elapsed:.2f}s ({num_nodes / elapsed:,.0f} nodes/s, "
+        f"{lines / elapsed:,.0f} lines/s)"
+    )
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
@@ -8,25 +8,49 @@ __version__ = "0.1.0"
 
 from pydiggy._types import (count, exact, geo, index, lang, reverse, uid,
                             unique, upsert)
+from pydiggy.aio import aquery, arun_mutation, atransaction
+from pydiggy.batching import QueryBatcher
+from pydiggy.cache import QueryCache, set_query_cache
+from pydiggy.columnar import hydrate_columns
 from pydiggy.node import Facets, Node, get_node, is_facets
-from pydiggy.operations import generate_mutation, hydrate, query, run_mutation
+from pydiggy.operations import (Deduplicator, bulk_upsert,
+                                generate_json_mutation, generate_mutation,
+                                hydrate, hydrate_stream, iter_mutation, query,
+                                query_iter, run_mutation, write_mutation)
+from pydiggy.session import Session, current_session
 
 __all__ = (
+    "aquery",
+    "arun_mutation",
+    "atransaction",
+    "bulk_upsert",
     "count",
+    "current_session",
+    "Deduplicator",
     "exact",
     "Facets",
+    "generate_json_mutation",
     "generate_mutation",
     "geo",
     "get_node",
     "hydrate",
+    "hydrate_columns",
+    "hydrate_stream",
     "is_facets",
+    "iter_mutation",
     "index",
     "lang",
     "Node",
     "query",
+    "query_iter",
+    "QueryBatcher",
+    "QueryCache",
     "reverse",
     "run_mutation",
+    "Session",
+    "set_query_cache",
     "uid",
     "unique",
     "upsert",
+    "write_mutation",
 )
@@ -0,0 +1,270 @@
+"""
+Asyncio versions of query, run_mutation and Node.save.
+
+When pydgraph has an asyncio client (AsyncDgraphClient, over gRPC's asyncio
+channels), requests are awaited on the event loop itself. Otherwise, and for
+synchronous clients that are passed in, every request runs on a shared thread
+pool instead. Either way, at most PYDIGGY_ASYNC_CONCURRENCY requests are in
+flight per event loop, and the others wait for their turn:
+
+    async with atransaction() as txn:
+        response = await txn.query(qry)
+        await txn.mutate(set_nquads=nquads)
+        await txn.commit()
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from inspect import iscoroutinefunction
+from os import environ
+from threading import Lock
+from typing import Any, Dict, List, Union
+from weakref import WeakKeyDictionary
+
+from pydiggy import cache as _cache
+from pydiggy import codec as _codec
+from pydiggy.cache import QueryCache, query_predicates
+from pydiggy.connection import (DEFAULT_DGRAPH_HOST, DEFAULT_DGRAPH_PORT,
+                                DEFAULT_POOL_SIZE, get_client, json_mutation)
+from pydiggy.operations import _query_output
+
+try:
+    from pydgraph import AsyncDgraphClient, AsyncDgraphClientStub
+except ImportError:  # pragma: no cover
+    AsyncDgraphClient = AsyncDgraphClientStub = None
+
+DEFAULT_ASYNC_CONCURRENCY = int(environ.get("PYDIGGY_ASYNC_CONCURRENCY", 64))
+
+
+class _LoopState:
+    def __init__(self, concurrency: int) -> None:
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.clients: Dict[Any, Any] = {}
+
+
+_concurrency = DEFAULT_ASYNC_CONCURRENCY
+_states: "WeakKeyDictionary[Any, _LoopState]" = WeakKeyDictionary()
+_executor = None
+_executor_lock = Lock()
+
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState(_concurrency)
+    return state
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_concurrency, thread_name_prefix="pydiggy"
+            )
+        return _executor
+
+
+def _forget_executor() -> None:
+    # The threads of the pool do not survive a fork
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_executor)
+
+
+def set_concurrency(limit: int) -> None:
+    """
+    Change how many requests may be in flight per event loop. It applies to
+    event loops that have not made a request yet.
+    """
+    global _concurrency, _executor
+    if limit < 1:
+        raise ValueError("The concurrency limit must be at least 1.")
+    _concurrency = limit
+    _states.clear()
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def get_async_client(
+    host: str = DEFAULT_DGRAPH_HOST, port: int = DEFAULT_DGRAPH_PORT
+) -> Any:
+    """
+    The client used by default for host and port: an AsyncDgraphClient of the
+    running event loop when pydgraph has one, or else the pooled client (see
+    get_client), whose requests run on the thread pool
+    """
+    if AsyncDgraphClient is None:
+        return get_client(host=host, port=port)
+
+    clients = _state().clients
+    key = (host, port)
+    client = clients.get(key)
+    if client is None:
+        stubs = [
+            AsyncDgraphClientStub(f"{host}:{port}")
+            for _ in range(max(DEFAULT_POOL_SIZE, 1))
+        ]
+        client = clients[key] = AsyncDgraphClient(*stubs)
+    return client
+
+
+async def close_async_clients() -> None:
+    """
+    Close the AsyncDgraphClients of the running event loop
+    """
+    clients = _state().clients
+    while clients:
+        _, client = clients.popitem()
+        await client.close()
+
+
+class AsyncTransaction:
+    """
+    A transaction whose requests are awaited. It wraps a pydgraph AsyncTxn, or
+    the transaction of a synchronous client, whose calls then run on the
+    thread pool. Leaving it as a context manager discards it.
+    """
+
+    def __init__(
+        self, client: Any, read_only: bool = False, best_effort: bool = False
+    ) -> None:
+        options = {}
+        if read_only:
+            options["read_only"] = read_only
+        if best_effort:
+            options["best_effort"] = best_effort
+        self._txn = client.txn(**options)
+        self._semaphore = _state().semaphore
+        self.native = iscoroutinefunction(self._txn.discard)
+
+    def __repr__(self):
+        kind = "native" if self.native else "threaded"
+        return f"<AsyncTransaction {kind}>"
+
+    async def __aenter__(self) -> "AsyncTransaction":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.discard()
+
+    async def _call(self, name: str, *args, **kwargs) -> Any:
+        method = getattr(self._txn, name)
+        async with self._semaphore:
+            if self.native:
+                return await method(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _get_executor(), partial(method, *args, **kwargs)
+            )
+
+    async def query(self, *args, **kwargs) -> Any:
+        return await self._call("query", *args, **kwargs)
+
+    async def mutate(self, *args, **kwargs) -> Any:
+        return await self._call("mutate", *args, **kwargs)
+
+    async def commit(self, *args, **kwargs) -> Any:
+        return await self._call("commit", *args, **kwargs)
+
+    async def discard(self, *args, **kwargs) -> Any:
+        return await self._call("discard", *args, **kwargs)
+
+
+def atransaction(
+    client: Any = None,
+    read_only: bool = False,
+    best_effort: bool = False,
+    host: str = None,
+    port: int = None,
+) -> AsyncTransaction:
+    """
+    Start an AsyncTransaction, with the default client for host and port
+    when no client is given (see get_async_client)
+    """
+    if client is None:
+        client = get_async_client(
+            host=host or DEFAULT_DGRAPH_HOST, port=port or DEFAULT_DGRAPH_PORT
+        )
+    return AsyncTransaction(
+        client, read_only=read_only, best_effort=best_effort
+    )
+
+
+async def aquery(
+    qry: str,
+    client: Any = None,
+    raw: bool = False,
+    json: bool = False,
+    *args,
+    codec: str = None,
+    columnar: bool = False,
+    cache: Union[QueryCache, bool] = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Perform a query and return hydrated Python Node objects, without blocking
+    the event loop. See query.
+    """
+    cache = _cache._resolve(cache)
+    if cache is not None:
+        key = cache.key(qry, args[0] if args else kwargs.get("variables"))
+        hit = cache.get(key)
+        if hit is not None:
+            return _query_output(*hit, raw, json, columnar, cached=True)
+        generation = cache.generation
+
+    host = kwargs.pop("host", None)
+    port = kwargs.pop("port", None)
+    async with atransaction(
+        client, read_only=True, host=host, port=port
+    ) as transaction:
+        raw_data = await transaction.query(qry, *args, **kwargs)
+    json_data = _codec.loads(raw_data.json, codec=codec)
+
+    if cache is not None:
+        cache.put(
+            key,
+            (raw_data, json_data),
+            query_predicates(qry),
+            generation=generation,
+            size=len(raw_data.json),
+        )
+    return _query_output(raw_data, json_data, raw, json, columnar)
+
+
+async def arun_mutation(
+    mutation: Union[str, List[Dict[str, Any]]],
+    client: Any = None,
+    *args,
+    codec: str = None,
+    **kwargs,
+) -> Any:
+    """
+    Run a set mutation (N-Quads, or the objects of a JSON mutation) in a
+    single transaction, without blocking the event loop, and return the
+    pydgraph response. See run_mutation.
+    """
+    host = kwargs.pop("host", None)
+    port = kwargs.pop("port", None)
+    if isinstance(mutation, str):
+        options = {"set_nquads": mutation}
+    else:
+        options = {"mutation": json_mutation(mutation, codec=codec)}
+
+    try:
+        async with atransaction(client, host=host, port=port) as transaction:
+            o = await transaction.mutate(*args, **options, **kwargs)
+            await transaction.commit()
+    finally:
+        _cache.invalidate(mutation)
+    return o
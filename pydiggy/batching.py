@@ -0,0 +1,333 @@
+"""
+Batching of concurrent queries into one request, dataloader style.
+
+Queries submitted to a QueryBatcher within the same time window (or, with
+asyncio, the same tick of the event loop) are merged into a single DQL
+request. The blocks, query variables (x as ...) and GraphQL variables ($x)
+of each query are prefixed, so that they cannot collide, and each caller gets
+back only its own blocks, under their original names:
+
+    batcher = QueryBatcher(client)
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(batcher.query, queries)
+
+Each caller hydrates its own blocks, in its own thread or task (and session).
+"""
+
+import asyncio
+import re
+from concurrent.futures import Future
+from os import environ
+from threading import Lock, Timer
+from typing import Any, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from pydiggy import codec as _codec
+from pydiggy.aio import atransaction
+from pydiggy.connection import _UNHEALTHY, PyDiggyClient, get_client
+from pydiggy.exceptions import InvalidData
+from pydiggy.operations import hydrate
+
+DEFAULT_BATCH_WINDOW = float(environ.get("PYDIGGY_BATCH_WINDOW", 0.002))
+DEFAULT_MAX_BATCH = int(environ.get("PYDIGGY_MAX_BATCH", 64))
+
+_TOKEN = re.compile(
+    r'(?P<string>"(?:[^"\\]|\\.)*")'
+    r"|(?P<comment>#[^\n]*)"
+    r"|(?P<number>[0-9][\w.]*)"
+    r"|(?P<name>\$?[~A-Za-z_][\w.]*)"
+    r"|(?P<punct>\S)"
+)
+
+# Calls whose arguments are query variables, rather than predicates
+_VARIABLE_CALLS = ("uid", "val")
+
+
+def _rename(qry: str, prefix: str) -> Tuple[str, str, Dict[str, str]]:
+    """
+    Prefix the blocks and variables of a query. Returns its (renamed)
+    GraphQL variable declarations, the body of its outer block, and the
+    original name of each block by its new name.
+    """
+    tokens = [
+        (m.lastgroup, m.group(), m.start(), m.end())
+        for m in _TOKEN.finditer(qry)
+        if m.lastgroup != "comment"
+    ]
+    if any(t[1] == "fragment" for t in tokens):
+        raise InvalidData("Queries with fragments cannot be batched.")
+
+    defined = {
+        tokens[i][1]
+        for i in range(len(tokens) - 1)
+        if tokens[i][0] == "name" and tokens[i + 1][1] == "as"
+    }
+
+    params, body, blocks = [], [], {}
+    depth = 0
+    calls: List[Optional[str]] = []
+    position = None
+
+    for i, (kind, text, start, end) in enumerate(tokens):
+        following = tokens[i + 1][1] if i + 1 < len(tokens) else ""
+        previous = tokens[i - 1] if i else (None, "", 0, 0)
+
+        if kind == "name" and text.startswith("$"):
+            text = f"${prefix}{text[1:]}"
+        elif kind == "name" and text in defined and (
+            following == "as"
+            or "math" in calls
+            or (calls and calls[-1] in _VARIABLE_CALLS)
+        ):
+            # Before blocks, for variables of whole blocks: b as var(...)
+            text = prefix + text
+        elif kind == "name" and depth == 1 and not calls:
+            is_block = following in ("(", "{") and previous[1] != "@"
+            if is_block and text != "var":
+                blocks[prefix + text] = text
+                text = prefix + text
+
+        if kind == "punct":
+            if text == "(":
+                calls.append(previous[1] if previous[0] == "name" else None)
+            elif text == ")" and calls:
+                calls.pop()
+            elif text == "{":
+                depth += 1
+                if depth == 1:
+                    position = end
+                    continue
+            elif text == "}":
+                depth -= 1
+                if depth == 0:
+                    body.append(qry[position:start])
+                    break
+
+        if depth == 0:
+            # The header: query name($a: string = "x")
+            if calls and not (text == "(" and len(calls) == 1):
+                params.append(qry[previous[3] : start] + text)
+            continue
+
+        body.append(qry[position:start] + text)
+        position = end
+
+    if depth != 0 or position is None:
+        raise InvalidData("Unbalanced braces in query.")
+
+    return "".join(params).strip(), "".join(body), blocks
+
+
+def merge_queries(
+    queries: List[Tuple[str, Optional[Dict[str, Any]]]]
+) -> Tuple[str, Dict[str, Any], List[Dict[str, str]]]:
+    """
+    Merge (query, variables) pairs into one query. Returns the query, its
+    variables, and the original name of each block by its new name, for
+    every one of the queries.
+    """
+    headers, bodies, variables, renames = [], [], {}, []
+    for i, (qry, qry_variables) in enumerate(queries):
+        prefix = f"q{i}_"
+        header, body, blocks = _rename(qry, prefix)
+        if header:
+            headers.append(header)
+        bodies.append(body.strip())
+        renames.append(blocks)
+        for key, value in (qry_variables or {}).items():
+            variables[f"${prefix}{key.lstrip('$')}"] = value
+
+    header = f"query batch({', '.join(headers)}) " if headers else ""
+    return header + "{\n" + "\n".join(bodies) + "\n}", variables, renames
+
+
+def split_result(
+    data: Dict[str, Any], renames: List[Dict[str, str]]
+) -> List[Dict[str, Any]]:
+    """
+    Split the decoded response of a merged query, per query
+    """
+    return [
+        {name: data[block] for block, name in blocks.items() if block in data}
+        for blocks in renames
+    ]
+
+
+class QueryBatcher:
+    """
+    Merge queries that are submitted close together into one request.
+
+    :param window: How long (in seconds) the first query of a batch waits for
+        others to join it. With asyncio, 0 batches the queries of one tick.
+    :param max_batch: A batch is sent as soon as it has this many queries
+    """
+
+    def __init__(
+        self,
+        client: PyDiggyClient = None,
+        window: float = None,
+        max_batch: int = None,
+        host: str = None,
+        port: int = None,
+    ) -> None:
+        self.client = client
+        self.window = DEFAULT_BATCH_WINDOW if window is None else window
+        self.max_batch = DEFAULT_MAX_BATCH if max_batch is None else max_batch
+        self.options = {
+            k: v for k, v in (("host", host), ("port", port)) if v is not None
+        }
+        self.requests = 0
+        self.queries = 0
+        self._lock = Lock()
+        self._pending = []
+        self._timer = None
+        self._loops = WeakKeyDictionary()
+        self._handles = WeakKeyDictionary()
+        self._tasks = set()
+
+    def __repr__(self):
+        return f"<QueryBatcher {self.queries} queries/{self.requests}>"
+
+    def submit(self, qry: str, variables: Dict[str, Any] = None) -> Future:
+        """
+        Queue a query, and return a Future of its decoded blocks
+        """
+        future = Future()
+        batch = None
+        with self._lock:
+            self.queries += 1
+            self._pending.append((qry, variables, future))
+            if len(self._pending) >= self.max_batch:
+                batch, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            elif len(self._pending) == 1:
+                self._timer = Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run(batch)
+        return future
+
+    def query(
+        self, qry: str, variables: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Perform a query as part of a batch, and return hydrated Python Node
+        objects, like query
+        """
+        return hydrate(self.submit(qry, variables).result())
+
+    def flush(self) -> None:
+        """
+        Send the queries that are waiting, now
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._timer = None
+        if batch:
+            self._run(batch)
+
+    def _request(self, batch):
+        if len(batch) == 1:
+            qry, variables, _ = batch[0]
+            request = qry, variables, None
+        else:
+            request = merge_queries(
+                [(qry, variables) for qry, variables, _ in batch]
+            )
+        with self._lock:
+            self.requests += 1
+        return request
+
+    @staticmethod
+    def _split(batch, error: Exception):
+        """
+        The halves of a batch that failed, to be retried, or None when the
+        error is to be reported to every query of the batch
+        """
+        code = getattr(error, "code", None)
+        if len(batch) == 1 or (callable(code) and code() in _UNHEALTHY):
+            return None
+        # One bad query should not fail the others: halves are retried
+        # until the bad queries are on their own
+        half = len(batch) // 2
+        return batch[:half], batch[half:]
+
+    def _run(self, batch) -> None:
+        try:
+            qry, variables, renames = self._request(batch)
+            client = self.client or get_client(**self.options)
+            data = _codec.loads(
+                client.query(qry, variables=variables or None).json
+            )
+        except Exception as e:
+            halves = self._split(batch, e)
+            if halves is None:
+                for _, _, future in batch:
+                    future.set_exception(e)
+            else:
+                for half in halves:
+                    self._run(half)
+            return
+
+        parts = split_result(data, renames) if renames else [data]
+        for (_, _, future), part in zip(batch, parts):
+            future.set_result(part)
+
+    async def aquery(
+        self, qry: str, variables: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Perform a query as part of a batch, without blocking the event loop
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self.queries += 1
+        pending = self._loops.setdefault(loop, [])
+        pending.append((qry, variables, future))
+        if len(pending) >= self.max_batch:
+            self._aflush(loop)
+        elif len(pending) == 1:
+            self._handles[loop] = loop.call_later(
+                self.window, self._aflush, loop
+            )
+        return hydrate(await future)
+
+    def _aflush(self, loop) -> None:
+        handle = self._handles.pop(loop, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._loops.pop(loop, None)
+        if batch:
+            task = loop.create_task(self._arun(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _arun(self, batch) -> None:
+        try:
+            qry, variables, renames = self._request(batch)
+            async with atransaction(
+                self.client, read_only=True, **self.options
+            ) as transaction:
+                raw_data = await transaction.query(
+                    qry, variables=variables or None
+                )
+            data = _codec.loads(raw_data.json)
+        except Exception as e:
+            halves = self._split(batch, e)
+            if halves is None:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for half in halves:
+                    await self._arun(half)
+            return
+
+        parts = split_result(data, renames) if renames else [data]
+        for (_, _, future), part in zip(batch, parts):
+            if not future.done():
+                future.set_result(part)
@@ -0,0 +1,300 @@
+"""
+A cache of query results, in front of query and aquery.
+
+Entries are keyed on the text and the variables of a query, and hold its
+decoded response, which is hydrated again on every hit (so that each caller
+gets its own Node instances). They are evicted least recently used first,
+once there are more than maxsize of them or their responses add up to more
+than max_bytes, and expire ttl seconds after they were stored.
+
+Every mutation run through pydiggy (run_mutation, bulk_upsert, Node.save and
+their async versions) invalidates the entries of every cache whose query
+reads one of the predicates it writes or deletes.
+
+The default cache is set with set_query_cache(), or with the
+PYDIGGY_QUERY_CACHE_SIZE, PYDIGGY_QUERY_CACHE_TTL and PYDIGGY_QUERY_CACHE_BYTES
+environment variables. A cache is meant for a single database.
+"""
+
+import re
+from collections import OrderedDict, namedtuple
+from os import environ
+from threading import RLock
+from time import monotonic
+from typing import Any, FrozenSet, Iterable, Optional, Union
+from weakref import WeakSet
+
+from pydiggy import codec as _codec
+
+DEFAULT_QUERY_CACHE_SIZE = int(environ.get("PYDIGGY_QUERY_CACHE_SIZE", 0))
+DEFAULT_QUERY_CACHE_TTL = float(environ.get("PYDIGGY_QUERY_CACHE_TTL", 0))
+DEFAULT_QUERY_CACHE_BYTES = int(environ.get("PYDIGGY_QUERY_CACHE_BYTES", 0))
+
+CacheStats = namedtuple(
+    "CacheStats",
+    (
+        "size",
+        "maxsize",
+        "bytes",
+        "hits",
+        "misses",
+        "evictions",
+        "expirations",
+        "invalidations",
+        "hit_rate",
+    ),
+)
+
+# Stands for every predicate: read by expand(), or deleted by S * * .
+ALL = "*"
+
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+_NAME = re.compile(r"[~<]?([A-Za-z_][\w.|@-]*)>?")
+_NQUAD_PREDICATE = re.compile(r"^\S+ (<[^>]*>|\*)", re.MULTILINE)
+_NOT_PREDICATES = frozenset(("uid", "func", "as", "and", "or", "not"))
+
+
+def query_predicates(qry: str) -> FrozenSet[str]:
+    """
+    The predicates that a query may read. This is an over-estimate: every
+    name in the query (outside of strings) is taken to be a predicate, which
+    is harmless, since they can only cause extra invalidations.
+    """
+    qry = _STRING.sub("", qry)
+    if "expand(" in qry:
+        return frozenset((ALL,))
+    predicates = set()
+    for name in _NAME.findall(qry):
+        name = name.split("@")[0].split("|")[0]
+        if name and name not in _NOT_PREDICATES:
+            predicates.add(name)
+    return frozenset(predicates)
+
+
+def _json_predicates(obj: Any, predicates: set, delete: bool = False) -> None:
+    if isinstance(obj, list):
+        for item in obj:
+            _json_predicates(item, predicates, delete)
+    elif isinstance(obj, dict):
+        if delete and set(obj) <= {"uid"}:
+            # Deleting {"uid": ...} deletes every predicate of the node
+            predicates.add(ALL)
+        for key, value in obj.items():
+            if key == "uid":
+                continue
+            predicates.add(key.split("|")[0].split("@")[0])
+            _json_predicates(value, predicates)
+
+
+def mutation_predicates(*mutations: Any) -> FrozenSet[str]:
+    """
+    The predicates written or deleted by mutations, which may be N-Quads,
+    the objects of a JSON mutation, or a pydgraph Mutation
+    """
+    predicates = set()
+    for mutation in mutations:
+        if not mutation:
+            continue
+        if isinstance(mutation, bytes):
+            mutation = mutation.decode("utf-8")
+        if isinstance(mutation, str):
+            for pred in _NQUAD_PREDICATE.findall(mutation):
+                predicates.add(ALL if pred == "*" else pred[1:-1])
+        elif isinstance(mutation, (list, dict)):
+            _json_predicates(mutation, predicates)
+        else:
+            for name in ("set_nquads", "del_nquads"):
+                predicates |= mutation_predicates(getattr(mutation, name, ""))
+            for name in ("set_json", "delete_json"):
+                value = getattr(mutation, name, b"")
+                if value:
+                    _json_predicates(
+                        _codec.loads(value), predicates, name == "delete_json"
+                    )
+    return frozenset(predicates)
+
+
+class QueryCache:
+    def __init__(
+        self,
+        maxsize: int = None,
+        ttl: float = None,
+        max_bytes: int = None,
+    ) -> None:
+        maxsize = DEFAULT_QUERY_CACHE_SIZE if maxsize is None else maxsize
+        ttl = DEFAULT_QUERY_CACHE_TTL if ttl is None else ttl
+        max_bytes = (
+            DEFAULT_QUERY_CACHE_BYTES if max_bytes is None else max_bytes
+        )
+        if maxsize < 1:
+            raise ValueError("A query cache needs a maxsize of at least 1.")
+
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.max_bytes = max_bytes or None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._readers = {}
+        self._lock = RLock()
+        _caches.add(self)
+
+    def __repr__(self):
+        return f"<QueryCache {len(self)}/{self.maxsize}>"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(qry: str, variables: Any = None) -> Any:
+        if variables:
+            variables = tuple(sorted(variables.items()))
+        return (qry, variables or None)
+
+    def get(self, key: Any) -> Optional[Any]:
+        """
+        The value stored for key, or None when it is missing or has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None:
+                if entry[1] <= monotonic():
+                    self._remove(key)
+                    self.expirations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(
+        self,
+        key: Any,
+        value: Any,
+        predicates: Iterable[str],
+        generation: int = None,
+        size: int = 0,
+    ) -> None:
+        """
+        Store value for key. When generation is given and anything has been
+        invalidated since, the value may be stale and is not stored.
+        """
+        expires = monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self.max_bytes and size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._remove(key)
+
+            predicates = frozenset(predicates)
+            self._entries[key] = (value, expires, predicates, size)
+            self.bytes += size
+            for pred in predicates:
+                self._readers.setdefault(pred, set()).add(key)
+
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes and self.bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Any) -> None:
+        _, _, predicates, size = self._entries.pop(key)
+        self.bytes -= size
+        for pred in predicates:
+            readers = self._readers.get(pred)
+            if readers is not None:
+                readers.discard(key)
+                if not readers:
+                    del self._readers[pred]
+
+    def invalidate(self, predicates: Iterable[str] = None) -> int:
+        """
+        Remove the entries that read any of predicates (or every entry,
+        without predicates). Returns how many were removed.
+        """
+        with self._lock:
+            self.generation += 1
+            if predicates is None:
+                keys = set(self._entries)
+            else:
+                predicates = set(predicates)
+                if ALL in predicates:
+                    keys = set(self._entries)
+                else:
+                    keys = set(self._readers.get(ALL, ()))
+                    for pred in predicates:
+                        keys.update(self._readers.get(pred, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return CacheStats(
+                len(self),
+                self.maxsize,
+                self.bytes,
+                self.hits,
+                self.misses,
+                self.evictions,
+                self.expirations,
+                self.invalidations,
+                self.hits / lookups if lookups else 0.0,
+            )
+
+
+_caches: "WeakSet[QueryCache]" = WeakSet()
+_default: Optional[QueryCache] = None
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """
+    The cache used by query and aquery when none is passed, if any
+    """
+    return _default
+
+
+def set_query_cache(cache: Optional[QueryCache]) -> None:
+    global _default
+    _default = cache
+
+
+def _resolve(cache: Union[QueryCache, bool, None]) -> Optional[QueryCache]:
+    if cache is None:
+        return _default
+    if cache is False:
+        return None
+    return cache
+
+
+def invalidate(*mutations: Any) -> None:
+    """
+    Invalidate what mutations touch, in every cache
+    """
+    caches = list(_caches)
+    if not caches:
+        return
+    predicates = mutation_predicates(*mutations)
+    if not predicates:
+        return
+    for cache in caches:
+        cache.invalidate(predicates)
+
+
+if DEFAULT_QUERY_CACHE_SIZE:
+    set_query_cache(QueryCache())
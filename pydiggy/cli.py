@@ -6,8 +6,10 @@ import importlib
 import click
 from pydgraph import Operation
 
+from pydiggy import operations
 from pydiggy.connection import get_client
 from pydiggy.node import Node
+from pydiggy.operations import DEFAULT_SHARD_SIZE
 
 
 @click.group()
@@ -63,3 +65,61 @@ def generate(module, run, host, port):
         op = Operation(schema=schema)
         client.alter(op)
         click.echo("Done.")
+
+
+@main.command("export-rdf")
+@click.argument("module")
+@click.option(
+    "-o",
+    "--out",
+    default="rdf",
+    type=click.Path(file_okay=False),
+    help="Directory to write to",
+)
+@click.option(
+    "-g",
+    "--generator",
+    default=None,
+    type=str,
+    help=(
+        "Function of the module that yields the nodes to export. "
+        "Defaults to the staged nodes"
+    ),
+)
+@click.option(
+    "--shard-size",
+    default=DEFAULT_SHARD_SIZE,
+    type=int,
+    help="Number of N-Quads per file",
+)
+@click.option(
+    "--strict/--no-strict",
+    default=None,
+    help=(
+        "Whether edges to unsaved nodes must be staged. "
+        "Defaults to strict for staged nodes only"
+    ),
+)
+def export_rdf(module, out, generator, shard_size, strict):
+    """Export nodes as gzipped RDF for the Dgraph bulk or live loader"""
+    click.echo(f"Exporting nodes of: {module}")
+    module = importlib.import_module(module)
+    nodes = getattr(module, generator)() if generator else None
+
+    def report(shard):
+        click.echo(
+            f"    - {shard.path}: {shard.lines} lines, {shard.bytes} bytes "
+            f"in {shard.seconds:.2f}s ({shard.rate:,.0f} lines/s)"
+        )
+
+    shards = operations.export_rdf(
+        out, nodes=nodes, shard_size=shard_size, strict=strict, on_shard=report
+    )
+
+    lines = sum(x.lines for x in shards)
+    seconds = sum(x.seconds for x in shards)
+    rate = lines / seconds if seconds else 0
+    click.echo(
+        f"\nDone. {lines} lines in {len(shards)} files "
+        f"({rate:,.0f} lines/s). Schema: {out}/pydiggy.schema"
+    )
@@ -0,0 +1,99 @@
+"""
+JSON codecs used to decode query responses and encode exploded nodes.
+
+The standard library json module is always available. orjson, ujson and
+simdjson (pysimdjson) are registered when they are installed. The default
+codec can be set with the PYDIGGY_JSON_CODEC environment variable, or at
+runtime with set_codec().
+"""
+
+import json as _json
+from collections import namedtuple
+from os import environ
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+try:
+    import simdjson
+except ImportError:  # pragma: no cover
+    simdjson = None
+
+Codec = namedtuple("Codec", ("name", "loads", "dumps"))
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(
+    name: str,
+    loads: Callable[[Union[bytes, str]], Any],
+    dumps: Callable[[Any], str],
+) -> Codec:
+    """
+    Make a codec available by name. dumps must return a str.
+    """
+    codec = Codec(name, loads, dumps)
+    CODECS[name] = codec
+    return codec
+
+
+register_codec("json", _json.loads, _json.dumps)
+
+if orjson is not None:  # pragma: no cover
+    register_codec(
+        "orjson", orjson.loads, lambda obj: orjson.dumps(obj).decode()
+    )
+
+if ujson is not None:  # pragma: no cover
+    register_codec("ujson", ujson.loads, ujson.dumps)
+
+if simdjson is not None:  # pragma: no cover
+    # pysimdjson only decodes
+    register_codec("simdjson", simdjson.loads, _json.dumps)
+
+DEFAULT_JSON_CODEC = environ.get("PYDIGGY_JSON_CODEC", "json")
+
+_current = None
+
+
+def get_codec(name: str = None) -> Codec:
+    """
+    Retrieve a codec by name, or the current default when no name is given.
+    """
+    if name is None:
+        if _current is None:
+            set_codec(DEFAULT_JSON_CODEC)
+        return _current
+
+    if name not in CODECS:
+        available = ", ".join(sorted(CODECS))
+        raise ValueError(
+            f"Unknown or uninstalled JSON codec: {name}. "
+            f"Available: {available}"
+        )
+    return CODECS[name]
+
+
+def set_codec(name: str) -> Codec:
+    """
+    Set the default codec used by pydiggy
+    """
+    global _current
+    _current = get_codec(name)
+    return _current
+
+
+def loads(data: Union[bytes, str], codec: str = None) -> Any:
+    return get_codec(codec).loads(data)
+
+
+def dumps(obj: Any, codec: str = None) -> str:
+    return get_codec(codec).dumps(obj)
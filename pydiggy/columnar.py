@@ -0,0 +1,175 @@
+"""
+Columnar hydration of query results.
+
+Instead of building a Node instance per object, the values of every annotated
+predicate are collected into one column per node type. Scalar columns become
+NumPy arrays when NumPy is installed, or array.array/list otherwise. Edges
+between nodes become a pair of uid arrays (source and target).
+"""
+
+from array import array
+from collections import deque, namedtuple
+from typing import Any, Dict, List, Union
+
+from pydiggy import codec as _codec
+from pydiggy.node import _PREDICATE, _REVERSE, Node, _parse_key
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+EdgeColumn = namedtuple("EdgeColumn", ("source", "target"))
+
+# (array typecode, numpy dtype) for each type that has a compact column
+_TYPECODES = {
+    int: ("q", "int64"),
+    float: ("d", "float64"),
+    bool: ("b", "bool"),
+}
+
+
+def _uid_column(values: List[int]):
+    if numpy is not None:
+        return numpy.array(values, dtype="uint64")
+    return array("Q", values)
+
+
+def _value_column(prop_type: Any, values: List[Any]):
+    if prop_type not in _TYPECODES:
+        return values
+
+    typecode, dtype = _TYPECODES[prop_type]
+    complete = None not in values
+
+    if prop_type is float:
+        values = [float("nan") if x is None else x for x in values]
+    elif not complete:
+        # Missing ints and bools cannot be represented in a typed array
+        return numpy.array(values, dtype=object) if numpy else values
+
+    if numpy is not None:
+        return numpy.array(values, dtype=dtype)
+    return array(typecode, values)
+
+
+class _Table:
+    def __init__(self, node: Node) -> None:
+        self.predicates = node._get_predicates()
+        self.rows = {}
+        self.uids = []
+        self.values = {
+            pred: []
+            for pred, prop_type in self.predicates.items()
+            if pred != "uid" and not Node._is_node_type(prop_type.prop_type)
+        }
+        self.edges = {
+            pred: set()
+            for pred, prop_type in self.predicates.items()
+            if Node._is_node_type(prop_type.prop_type)
+        }
+
+    def row(self, uid: int) -> int:
+        row = self.rows.get(uid)
+        if row is None:
+            row = len(self.uids)
+            self.rows[uid] = row
+            self.uids.append(uid)
+            for column in self.values.values():
+                column.append(None)
+        return row
+
+    def columns(self) -> Dict[str, Any]:
+        columns = {"uid": _uid_column(self.uids)}
+        for pred, values in self.values.items():
+            prop_type = self.predicates[pred]
+            if prop_type.is_list_type:
+                columns[pred] = values
+            else:
+                columns[pred] = _value_column(prop_type.prop_type, values)
+        for pred, edges in self.edges.items():
+            edges = sorted(edges)
+            columns[pred] = EdgeColumn(
+                _uid_column([x[0] for x in edges]),
+                _uid_column([x[1] for x in edges]),
+            )
+        return columns
+
+
+def hydrate_columns(
+    data: Union[Dict[str, Any], bytes, str],
+    types: List[Node] = None,
+    codec: str = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Given data retrieved from dgraph, return a mapping of node type names to
+    their columns, without creating any Node instances.
+
+    Every uid is one row of its type, no matter how many times it appears.
+    Each column is named after its predicate, and "uid" holds the uid of each
+    row. Edges are an EdgeColumn of source and target uids.
+
+    :param types: Only collect columns for these node types
+    :param codec: The JSON codec used to decode data when it is raw JSON
+    """
+    if isinstance(data, (bytes, str)):
+        data = _codec.loads(data, codec=codec)
+
+    registered = Node._get_registered()
+    allowed = {x.__name__ for x in types} if types else None
+    tables = {}
+    queue = deque()
+
+    def resolve(raw):
+        """Return the uid of a raw object, queueing it to be collected"""
+        if not isinstance(raw, dict) or "uid" not in raw:
+            return None
+        uid = int(raw["uid"], 16)
+        node = registered.get(raw.get("_type"))
+        if node is not None and (allowed is None or node.__name__ in allowed):
+            queue.append((node, uid, raw))
+        return uid
+
+    for raw_data in data.values():
+        if isinstance(raw_data, list):
+            for raw in raw_data:
+                resolve(raw)
+
+    while queue:
+        node, uid, raw = queue.popleft()
+        name = node.__name__
+        if name not in tables:
+            tables[name] = _Table(node)
+        table = tables[name]
+        row = table.row(uid)
+
+        for key, value in raw.items():
+            kind, pred = _parse_key(key)
+            if kind is _PREDICATE and pred in table.values:
+                table.values[pred][row] = value
+            elif kind is _PREDICATE and pred in table.edges:
+                if not isinstance(value, list):
+                    value = [value]
+                for x in value:
+                    target = resolve(x)
+                    if target is not None:
+                        table.edges[pred].add((uid, target))
+            elif kind is _REVERSE:
+                if not isinstance(value, list):
+                    value = [value]
+                for x in value:
+                    source = resolve(x)
+                    if source is None:
+                        continue
+                    child = registered.get(x.get("_type"))
+                    if child is None or (
+                        allowed is not None and child.__name__ not in allowed
+                    ):
+                        continue
+                    if child.__name__ not in tables:
+                        tables[child.__name__] = _Table(child)
+                    edges = tables[child.__name__].edges
+                    if pred in edges:
+                        edges[pred].add((source, uid))
+
+    return {name: table.columns() for name, table in tables.items()}
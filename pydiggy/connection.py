@@ -1,9 +1,38 @@
+import os
+from collections import namedtuple
 from os import environ
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Tuple
 
+import grpc
 import pydgraph
 
+from pydiggy import codec as _codec
+
 DEFAULT_DGRAPH_HOST = environ.get("DEFAULT_DGRAPH_HOST", "localhost")
 DEFAULT_DGRAPH_PORT = int(environ.get("DEFAULT_DGRAPH_PORT", 9080))
+DEFAULT_POOL_SIZE = int(environ.get("PYDIGGY_POOL_SIZE", 4))
+DEFAULT_POOL_MAX_FAILURES = int(environ.get("PYDIGGY_POOL_MAX_FAILURES", 3))
+DEFAULT_POOL_EJECT_SECONDS = float(
+    environ.get("PYDIGGY_POOL_EJECT_SECONDS", 30)
+)
+
+PoolStats = namedtuple(
+    "PoolStats",
+    (
+        "addr",
+        "size",
+        "healthy",
+        "in_flight",
+        "requests",
+        "failures",
+        "ejections",
+    ),
+)
+
+# Errors that say something about the connection, rather than the request
+_UNHEALTHY = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
 
 
 class PyDiggyClient(pydgraph.DgraphClient):
@@ -55,6 +84,265 @@ class PyDiggyTestClient(pydgraph.DgraphClient):
         return PyDiggyTestTransaction()
 
 
+def json_mutation(
+    set_obj: Any = None, del_obj: Any = None, codec: str = None
+) -> pydgraph.Mutation:
+    """
+    Build a JSON (set_json/delete_json) mutation, encoded with the configured
+    codec
+    """
+    mutation = pydgraph.Mutation()
+    if set_obj:
+        mutation.set_json = _codec.dumps(set_obj, codec=codec).encode("utf-8")
+    if del_obj:
+        mutation.delete_json = _codec.dumps(del_obj, codec=codec).encode(
+            "utf-8"
+        )
+    return mutation
+
+
+class PooledStub(pydgraph.DgraphClientStub):
+    """
+    A stub (and its gRPC channel) owned by a ClientPool, which keeps count of
+    its calls in flight and of its consecutive failures
+    """
+
+    def __init__(self, addr: str, pool: "ClientPool") -> None:
+        super().__init__(addr)
+        self.addr = addr
+        self.pool = pool
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def __repr__(self):
+        return f"<PooledStub {self.addr} in_flight={self.in_flight}>"
+
+    def _call(self, method, *args, **kwargs):
+        self.pool._acquire(self)
+        try:
+            result = method(*args, **kwargs)
+        except grpc.RpcError as e:
+            self.pool._release(self, e)
+            raise
+        except BaseException:
+            self.pool._release(self)
+            raise
+        self.pool._release(self)
+        return result
+
+    def _call_future(self, method, *args, **kwargs):
+        # The call is in flight until its future is done
+        def done(future):
+            error = None if future.cancelled() else future.exception()
+            self.pool._release(self, error)
+
+        self.pool._acquire(self)
+        try:
+            future = method(*args, **kwargs)
+        except grpc.RpcError as e:
+            self.pool._release(self, e)
+            raise
+        except BaseException:
+            self.pool._release(self)
+            raise
+        future.add_done_callback(done)
+        return future
+
+    def login(self, *args, **kwargs):
+        return self._call(super().login, *args, **kwargs)
+
+    def alter(self, *args, **kwargs):
+        return self._call(super().alter, *args, **kwargs)
+
+    def async_alter(self, *args, **kwargs):
+        return self._call_future(super().async_alter, *args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        return self._call(super().query, *args, **kwargs)
+
+    def async_query(self, *args, **kwargs):
+        return self._call_future(super().async_query, *args, **kwargs)
+
+    def commit_or_abort(self, *args, **kwargs):
+        return self._call(super().commit_or_abort, *args, **kwargs)
+
+    def check_version(self, *args, **kwargs):
+        return self._call(super().check_version, *args, **kwargs)
+
+    # The requests below only exist in newer versions of pydgraph
+
+    def run_dql(self, *args, **kwargs):
+        return self._call(super().run_dql, *args, **kwargs)
+
+    def allocate_ids(self, *args, **kwargs):
+        return self._call(super().allocate_ids, *args, **kwargs)
+
+    def create_namespace(self, *args, **kwargs):
+        return self._call(super().create_namespace, *args, **kwargs)
+
+    def drop_namespace(self, *args, **kwargs):
+        return self._call(super().drop_namespace, *args, **kwargs)
+
+    def list_namespaces(self, *args, **kwargs):
+        return self._call(super().list_namespaces, *args, **kwargs)
+
+
+class PooledClient(PyDiggyClient):
+    """
+    A client over the stubs of a ClientPool. Every transaction (and every
+    other request) goes to the healthy stub with the fewest calls in flight.
+    """
+
+    def __init__(self, pool: "ClientPool") -> None:
+        super().__init__(*pool.stubs)
+        self.pool = pool
+
+    def any_client(self) -> PooledStub:
+        return self.pool.select()
+
+
+class ClientPool:
+    """
+    A fixed number of stubs to one Dgraph alpha, shared by everything in the
+    process that connects to it.
+
+    A stub whose calls fail with UNAVAILABLE or DEADLINE_EXCEEDED max_failures
+    times in a row is ejected: it is not selected again for eject_seconds,
+    unless every stub of the pool is ejected.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_DGRAPH_HOST,
+        port: int = DEFAULT_DGRAPH_PORT,
+        size: int = None,
+        max_failures: int = None,
+        eject_seconds: float = None,
+    ) -> None:
+        size = DEFAULT_POOL_SIZE if size is None else size
+        if size < 1:
+            raise ValueError("A client pool needs at least one stub.")
+
+        self.addr = f"{host}:{port}"
+        self.max_failures = (
+            DEFAULT_POOL_MAX_FAILURES if max_failures is None else max_failures
+        )
+        self.eject_seconds = (
+            DEFAULT_POOL_EJECT_SECONDS
+            if eject_seconds is None
+            else eject_seconds
+        )
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.pid = os.getpid()
+        self._next = 0
+        self._lock = Lock()
+        self.stubs = tuple(PooledStub(self.addr, self) for _ in range(size))
+        self.client = PooledClient(self)
+
+    def __repr__(self):
+        return f"<ClientPool {self.addr} {len(self.stubs)}>"
+
+    def select(self) -> PooledStub:
+        """
+        The healthy stub with the fewest calls in flight. Ties are broken
+        round robin, so that an idle pool still spreads its requests.
+        """
+        now = monotonic()
+        with self._lock:
+            size = len(self.stubs)
+            start = self._next
+            self._next = (start + 1) % size
+            candidates = [
+                self.stubs[(start + i) % size]
+                for i in range(size)
+                if self.stubs[(start + i) % size].ejected_until <= now
+            ]
+            if not candidates:
+                return min(self.stubs, key=lambda x: x.ejected_until)
+            return min(candidates, key=lambda x: x.in_flight)
+
+    def _acquire(self, stub: PooledStub) -> None:
+        with self._lock:
+            stub.in_flight += 1
+            self.requests += 1
+
+    def _release(self, stub: PooledStub, error: Exception = None) -> None:
+        code = getattr(error, "code", None)
+        unhealthy = callable(code) and code() in _UNHEALTHY
+        with self._lock:
+            stub.in_flight -= 1
+            if not unhealthy:
+                stub.failures = 0
+                return
+            stub.failures += 1
+            self.failures += 1
+            if stub.failures >= self.max_failures:
+                stub.ejected_until = monotonic() + self.eject_seconds
+                self.ejections += 1
+
+    def close(self) -> None:
+        for stub in self.stubs:
+            stub.close()
+
+    def stats(self) -> PoolStats:
+        now = monotonic()
+        with self._lock:
+            return PoolStats(
+                self.addr,
+                len(self.stubs),
+                sum(1 for x in self.stubs if x.ejected_until <= now),
+                sum(x.in_flight for x in self.stubs),
+                self.requests,
+                self.failures,
+                self.ejections,
+            )
+
+
+_pools: Dict[Tuple[str, int], ClientPool] = {}
+_pools_lock = Lock()
+
+
+def get_pool(
+    host=DEFAULT_DGRAPH_HOST, port=DEFAULT_DGRAPH_PORT, **kwargs
+) -> ClientPool:
+    """
+    The process wide pool for host and port, which is created (with kwargs)
+    the first time it is needed
+    """
+    key = (host, port)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[key] = ClientPool(host, port, **kwargs)
+    return pool
+
+
+def close_pools() -> None:
+    """
+    Close the channels of every pool, and forget them
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _forget_pools() -> None:
+    # gRPC channels cannot be used across a fork, so a child process starts
+    # without any pool. The channels belong to the parent and are not closed.
+    global _pools_lock
+    _pools_lock = Lock()
+    _pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pools)
+
+
 def get_stub(host=DEFAULT_DGRAPH_HOST, port=DEFAULT_DGRAPH_PORT):  # noqa
     addr = f"{host}:{port}"
     stub = pydgraph.DgraphClientStub(addr)
@@ -63,9 +351,20 @@ def get_stub(host=DEFAULT_DGRAPH_HOST, port=DEFAULT_DGRAPH_PORT):  # noqa
 
 
 def get_client(
-    host=DEFAULT_DGRAPH_HOST, port=DEFAULT_DGRAPH_PORT, test=False
+    host=DEFAULT_DGRAPH_HOST,
+    port=DEFAULT_DGRAPH_PORT,
+    test=False,
+    pooled=None,
 ):  # noqa
+    """
+    A client for host and port. Unless pooled is False (or PYDIGGY_POOL_SIZE
+    is 0), it is the shared client of the process wide pool for that address.
+    """
     if test:
         return PyDiggyTestClient(get_stub())
+    if pooled is None:
+        pooled = DEFAULT_POOL_SIZE > 0
+    if pooled:
+        return get_pool(host=host, port=port).client
     stub = get_stub(host=host, port=port)
     return PyDiggyClient(stub)
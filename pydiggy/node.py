@@ -3,26 +3,51 @@ from __future__ import annotations
 import copy
 import inspect
 import re
-from collections import namedtuple
-from copy import deepcopy
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
-from functools import partial
-from itertools import count as _count
-from typing import (Any, Dict, List, Optional, Tuple, Union, _GenericAlias,
-                    get_type_hints)
+from functools import lru_cache, partial
+from os import environ
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Set,
+                    Tuple, Union, _GenericAlias, get_type_hints)
 
+from pydiggy import cache as _cache
+from pydiggy import codec as _codec
 from pydiggy._types import ACCEPTABLE_GENERIC_ALIASES  # uid,
 from pydiggy._types import (ACCEPTABLE_TRANSLATIONS, DGRAPH_TYPES,
                             SELF_INSERTING_DIRECTIVE_ARGS, Directive, count,
-                            geo, lang, reverse, upsert)
-from pydiggy.connection import PyDiggyClient, get_client
+                            exact, geo, index, lang, reverse, upsert)
+from pydiggy.connection import PyDiggyClient, get_client, json_mutation
 from pydiggy.exceptions import (ConflictingType, InvalidData, MissingAttribute,
                                 NotStaged)
+from pydiggy.registry import InstanceRegistry, RegistryStats
+from pydiggy.session import current_session
 from pydiggy.utils import _parse_subject, _raw_value
 
+DEFAULT_GET_MANY_CHUNK_SIZE = int(
+    environ.get("PYDIGGY_GET_MANY_CHUNK_SIZE", 10_000)
+)
+DEFAULT_GET_MANY_WORKERS = int(environ.get("PYDIGGY_GET_MANY_WORKERS", 4))
+
 PropType = namedtuple("PropType", ("prop_type", "is_list_type", "directives"))
 
+ReversePlan = namedtuple("ReversePlan", ("name", "many", "with_facets"))
+
+# Per instance attributes that Node keeps for itself
+_INSTANCE_STATE = (
+    "_fresh",
+    "_init",
+    "_dirty_set",
+    "_pending_delete_set",
+    "_snapshot_dict",
+)
+
+_SKIP = "skip"
+_FACET = "facet"
+_REVERSE = "reverse"
+_PREDICATE = "predicate"
+
 
 def Facets(obj, **kwargs):
     f = namedtuple("Facets", ["obj"] + list(kwargs.keys()))
@@ -79,6 +104,156 @@ def extract_type(p_type):
         return p_type
 
 
+@lru_cache(maxsize=4096)
+def _parse_key(key: str) -> Tuple[str, Optional[str]]:
+    """
+    Classify a key of a raw Dgraph object. Returns the kind of key, and the
+    facet or predicate name it refers to.
+    """
+    if "|" in key:
+        return _FACET, key.split("|")[1]
+    elif key.startswith("~"):
+        return _REVERSE, key[1:]
+    elif key.startswith("_") or key == "uid":
+        return _SKIP, None
+    return _PREDICATE, key
+
+
+def _format_literal(obj: Any) -> str:
+    if isinstance(obj, float):
+        return f'"{obj}"^^<xs:float>'
+    elif isinstance(obj, datetime):
+        return f'"{obj.isoformat()}"'
+    return f'"{obj}"'
+
+
+def _format_bool(obj: Any) -> str:
+    return f'"{str(obj).lower()}"'
+
+
+def _format_int(obj: Any) -> str:
+    return f'"{int(obj)}"^^<xs:int>'
+
+
+def _format_float(obj: Any) -> str:
+    return f'"{obj}"^^<xs:float>'
+
+
+def _format_geo(obj: Any) -> str:
+    if hasattr(obj, "__geojson__"):
+        obj = obj.__geojson__()
+    return f'"{obj}"^^<geo:geojson>'
+
+
+def _format_datetime(obj: Any) -> str:
+    return f'"{obj.isoformat()}"'
+
+
+# Values of these exact types are encoded by the formatter of their predicate
+# without any further checks
+_SCALAR_TYPES = frozenset((str, int, float, bool, datetime))
+
+# Formatters of N-Quad objects, by annotated type. Anything else is written
+# with _format_literal.
+_FORMATTERS = {
+    bool: _format_bool,
+    int: _format_int,
+    float: _format_float,
+    geo: _format_geo,
+    datetime: _format_datetime,
+}
+
+
+def _json_literal(obj: Any) -> Any:
+    if isinstance(obj, (str, int, float, bool, dict, list)):
+        return obj
+    elif isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _json_geo(obj: Any) -> Any:
+    if hasattr(obj, "__geojson__"):
+        obj = obj.__geojson__()
+    if isinstance(obj, (str, bytes)):
+        obj = _codec.loads(obj)
+    return obj
+
+
+def _json_datetime(obj: Any) -> str:
+    return obj.isoformat()
+
+
+# The same, for values of JSON (set_json) mutations
+_JSON_FORMATTERS = {
+    bool: bool,
+    int: int,
+    float: float,
+    geo: _json_geo,
+    datetime: _json_datetime,
+}
+
+
+def _json_ref(subject: str) -> str:
+    """
+    The uid of a JSON mutation object, given an N-Quad subject
+    """
+    return subject[1:-1] if subject.startswith("<") else subject
+
+
+def _node_id(item: Any) -> int:
+    return id(item.obj if is_facets(item) else item)
+
+
+def _unwrap_facets(item: Any) -> Any:
+    return item.obj if is_facets(item) else item
+
+
+def _value_key(item: Any) -> Any:
+    """
+    A hashable key of a value, that compares nodes by uid and facets by
+    their values
+    """
+    if is_facets(item):
+        return (_value_key(item.obj),) + tuple(
+            _value_key(x) for x in item[1:]
+        )
+    elif isinstance(item, Node):
+        return (Node, item.uid)
+    try:
+        hash(item)
+    except TypeError:
+        return repr(item)
+    return item
+
+
+def _list_delta(old: Tuple[Any, ...], new: List[Any]) -> Tuple[list, list]:
+    """
+    The items of new that are not in old, and the items of old (without
+    their facets) that are not in new
+    """
+    old_keys = {_value_key(x) for x in old}
+    new_keys = {_value_key(x) for x in new}
+    added = [x for x in new if _value_key(x) not in old_keys]
+
+    # An edge whose facets changed is set again, but not deleted
+    kept = {_value_key(_unwrap_facets(x)) for x in new}
+    removed = [
+        _unwrap_facets(x)
+        for x in old
+        if _value_key(x) not in new_keys
+        and _value_key(_unwrap_facets(x)) not in kept
+    ]
+    return added, removed
+
+
+def is_list_type(prop_type: Any) -> bool:
+    return (
+        isinstance(prop_type, _GenericAlias)
+        and prop_type.__origin__ in (list, tuple)
+    )
+
+
 def get_node(name: str) -> Node:
     """
     Retrieve a registered node class.
@@ -88,8 +263,7 @@ def get_node(name: str) -> Node:
     This is a safe method to make sure that any models used have been
     declared as a Node.
     """
-    registered = {x.__name__: x for x in Node._nodes}
-    return registered.get(name, None)
+    return Node._get_registered().get(name, None)
 
 
 class ReverseRegistry(dict):
@@ -107,14 +281,149 @@ class ReverseRegistry(dict):
             super().__setattr__(key, value)
 
 
+class ReverseEdges(list):
+    """
+    List of the nodes that point at a node through a reverse edge. The
+    position of each node is indexed on its identity, so that adding and
+    removing are O(1), and each node is only held once. Removing a node moves
+    the last one into its place.
+    """
+
+    __slots__ = ("_positions",)
+
+    def __init__(self, items=()) -> None:
+        super().__init__()
+        self._positions = {}
+        for item in items:
+            self.append(item)
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __contains__(self, item) -> bool:
+        if _node_id(item) in self._positions:
+            return True
+        return super().__contains__(item)
+
+    def _reindex(self) -> None:
+        self._positions = {_node_id(x): i for i, x in enumerate(self)}
+
+    def append(self, item) -> None:
+        key = _node_id(item)
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self)
+            super().append(item)
+        else:
+            super().__setitem__(position, item)
+
+    def extend(self, items) -> None:
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def discard(self, item) -> None:
+        position = self._positions.pop(_node_id(item), None)
+        if position is None:
+            return
+        last = super().pop()
+        if position < len(self):
+            super().__setitem__(position, last)
+            self._positions[_node_id(last)] = position
+
+    def remove(self, item) -> None:
+        if _node_id(item) not in self._positions:
+            raise ValueError(f"{item} is not in {self}")
+        self.discard(item)
+
+    def clear(self) -> None:
+        super().clear()
+        self._positions = {}
+
+
+def _reindexing(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._reindex()
+        return result
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+# Other changes in place may move any node, so they index them all again
+for _name in (
+    "insert",
+    "pop",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+):
+    setattr(ReverseEdges, _name, _reindexing(_name))
+del _name
+
+
+class LoadedList(list):
+    """
+    List of the values of a predicate, as loaded from Dgraph. It is copied
+    the first time it is changed in place (copy on write), so that saving
+    only sends what was added and removed since.
+    """
+
+    __slots__ = ("_original",)
+
+    def __init__(self, items=()) -> None:
+        super().__init__(items)
+        self._original = None
+
+
+def _copying_on_write(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        if self._original is None:
+            self._original = tuple(self)
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "append",
+    "extend",
+    "insert",
+    "remove",
+    "pop",
+    "clear",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+):
+    setattr(LoadedList, _name, _copying_on_write(_name))
+del _name
+
+
 class NodeMeta(type):
-    def __new__(cls, name, bases, attrs, **kwargs):
+    _registry_options = {}
+
+    def __new__(cls, name, bases, attrs, compact: bool = False, **kwargs):
         directives = [
             x for x in attrs if x in attrs.get("__annotations__", {}).keys()
         ]
         attrs["_directives"] = dict()
-        attrs["_instances"] = dict()
+        attrs["_instances"] = InstanceRegistry(**cls._registry_options)
         attrs["_reverses"] = set()
+        attrs["_type_hints"] = None
 
         for base in bases:
             attrs["_directives"].update(base._directives)
@@ -150,21 +459,87 @@ class NodeMeta(type):
                         {f"{reverse_with}.{query_name}.{name}": reverse_name}
                     )
 
-        return super().__new__(cls, name, bases, attrs, **kwargs)
+        # Precompute how each predicate with a reverse directive is assigned
+        attrs["_reverse_plans"] = {}
+        for pred, pred_directives in attrs["_directives"].items():
+            for d in pred_directives:
+                if isinstance(d, reverse):
+                    attrs["_reverse_plans"][pred] = ReversePlan(
+                        d.name if d.name else f"_{pred}", d.many, d.with_facets
+                    )
+                    break
+
+        compact = compact or any(getattr(b, "_compact", False) for b in bases)
+        attrs["_compact"] = compact
+        if compact and "__slots__" not in attrs:
+            attrs["__slots__"] = cls._make_slots(bases, attrs)
+
+        node = super().__new__(cls, name, bases, attrs, **kwargs)
+        node._slotted = tuple(
+            slot
+            for klass in node.__mro__
+            for slot in klass.__dict__.get("__slots__", ())
+            if slot not in ("__dict__", "__weakref__")
+        )
+        return node
+
+    @staticmethod
+    def _make_slots(bases, attrs) -> Tuple[str, ...]:
+        """
+        Slots for the instance state of a compact node, and each of its
+        annotated predicates (unless it has a class level default).
+        Predicates that are not annotated (reverse edges, for example) still
+        fall back to a __dict__, which is only allocated when first used.
+        """
+        existing = {
+            slot
+            for base in bases
+            for klass in base.__mro__
+            for slot in klass.__dict__.get("__slots__", ())
+        }
+        names = ("uid",) + _INSTANCE_STATE + tuple(
+            pred
+            for pred in attrs.get("__annotations__", {})
+            if pred not in attrs
+        )
+        slots = [x for x in dict.fromkeys(names) if x not in existing]
+
+        if not any(base.__dictoffset__ for base in bases):
+            slots.append("__dict__")
+        if not any(base.__weakrefoffset__ for base in bases):
+            slots.append("__weakref__")
+
+        return tuple(slots)
 
 
 class Node(metaclass=NodeMeta):
+    """
+    Base class of all nodes. Subclasses declared with compact=True store their
+    annotated predicates in __slots__, which saves memory when very many
+    instances are kept around.
+
+        class Region(Node, compact=True):
+            name: str
+    """
+
+    __slots__ = ()
+
     uid: int
 
-    _i = _count()
     _nodes = []
-    _staged = {}
+    _generation = 0
+    _registered = None
 
     def __init_subclass__(cls, is_abstract: bool = False) -> None:
         if not is_abstract:
             cls._register_node(cls)
 
     def __init__(self, uid=None, **kwargs):
+        self._init = False
+        self._dirty_set = None
+        self._pending_delete_set = None
+        self._snapshot_dict = None
+
         if uid is None:
             # TODO:
             # - There probably should be another property that is set here
@@ -177,24 +552,12 @@ class Node(metaclass=NodeMeta):
             self._fresh = False
 
         self.uid = uid
-        self._dirty = set()
-        self._pending_delete = set()
-
-        # TODO:
-        # - perhaps this code to generate self._annotations belongs somewhere
-        #   else. Regardless, there is a lot of cleanup in this module that
-        #   could probably use this property instead of running get_type_hints
-        localns = {x.__name__: x for x in Node._nodes}
-        localns.update({"List": List, "Union": Union, "Tuple": Tuple})
-        self._annotations = get_type_hints(
-            self.__class__, globalns=globals(), localns=localns
-        )
 
         for arg, val in kwargs.items():
             if arg in self._annotations:
                 setattr(self, arg, val)
 
-        self.__class__._instances.update({self.uid: self})
+        self.__class__._instances[self.uid] = self
         self._init = True
 
         # The following code looks to see if there are any typing.List
@@ -231,71 +594,250 @@ class Node(metaclass=NodeMeta):
         # TODO:
         # - Make sure name is not a protected keyword being manually set (like _type)
 
-        orig = self.__dict__.get(name, None)
-        self.__dict__[name] = value
-        if hasattr(self, "_init") and self._init and not name.startswith("_"):
-            self._dirty.add(name)
-        if name in self._directives and any(
-            isinstance(d, reverse) for d in self._directives[name]
+        plan = self._reverse_plans.get(name)
+        orig = None
+        if plan is not None:
+            try:
+                orig = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+
+        if (
+            not name.startswith("_")
+            and getattr(self, "_init", False)
+            and not self._fresh
+            and name not in (self._snapshot_dict or ())
+            and name in self._get_predicates()
         ):
-            directive = list(
-                filter(
-                    lambda d: isinstance(d, reverse), self._directives[name]
-                )
-            )[0]
-            reverse_name = directive.name if directive.name else f"_{name}"
-            if reverse_name not in self.__class__._reverses:
-                use_class = (
-                    value[0].__class__
-                    if isinstance(value, list)
-                    else value.__class__
-                )
-                use_class._reverses.add(reverse_name)
-
-            def _assign(obj, key, value, do_many, remove=False):
-                o = obj.obj if is_facets(obj) else obj
+            self._take_snapshot(name)
 
-                if is_facets(obj):
-                    props = obj._asdict()
-                    props["obj"] = value
-                    value = Facets(**props)
+        object.__setattr__(self, name, value)
+        if not name.startswith("_") and getattr(self, "_init", False):
+            self._dirty.add(name)
 
-                if do_many:
-                    if not hasattr(o, key):
-                        setattr(o, key, list())
-                    if remove:
-                        o.__dict__[key].remove(value)
-                    else:
-                        o.__dict__[key].append(value)
-                else:
-                    setattr(o, key, value)
+        if plan is not None:
+            self._update_reverse(plan, value, orig)
 
+    def _update_reverse(self, plan: ReversePlan, value: Any, orig: Any):
+        """
+        Keep the reverse edges of the nodes that self points at (and used to
+        point at) in sync with a newly assigned value
+        """
+        # TODO:
+        # - Add tuple and set support
+        if isinstance(value, list):
+            items = [
+                x.obj if is_facets(x) and not plan.with_facets else x
+                for x in value
+            ]
+        elif value is not None:
             # TODO:
-            # - Add tuple and set support
-            if isinstance(value, (list,)):
-                for item in value:
-                    if is_facets(item) and directive.with_facets is False:
-                        item = item.obj
-                    _assign(item, reverse_name, self, directive.many)
+            # Also, run a check that value is of type directive
+            items = [value]
+        else:
+            items = []
+
+        if orig is not None and orig is not value:
+            kept = {id(x.obj if is_facets(x) else x) for x in items}
+            for item in orig if isinstance(orig, list) else [orig]:
+                target = item.obj if is_facets(item) else item
+                if id(target) not in kept:
+                    self._link_reverse(plan, item, remove=True)
+
+        for item in items:
+            self._link_reverse(plan, item)
+
+    def _link_reverse(self, plan: ReversePlan, item: Any, remove=False):
+        target = item.obj if is_facets(item) else item
+        if not isinstance(target, Node):
+            return
+
+        value = self
+        if is_facets(item):
+            props = item._asdict()
+            props["obj"] = self
+            value = Facets(**props)
+
+        target.__class__._reverses.add(plan.name)
+        try:
+            existing = object.__getattribute__(target, plan.name)
+        except AttributeError:
+            existing = None
+
+        # Reverse edges are derived from the forward edge, so they are set
+        # directly, without marking the target as dirty
+        if plan.many:
+            if not isinstance(existing, ReverseEdges):
+                existing = ReverseEdges(existing or ())
+                object.__setattr__(target, plan.name, existing)
+            if remove:
+                existing.discard(value)
             else:
-                # TODO:
-                # Also, run a check that value is of type directive
-                if value is not None:
-                    _assign(value, reverse_name, self, directive.many)
-                elif orig:
-                    _assign(
-                        orig, reverse_name, self, directive.many, remove=True
-                    )
+                existing.append(value)
+        elif remove:
+            if existing is not None and _node_id(existing) == id(self):
+                object.__delattr__(target, plan.name)
+        else:
+            object.__setattr__(target, plan.name, value)
 
     @classmethod
     def _reset(cls) -> None:
-        cls._i = _count()
-        cls._instances = dict()
+        current_session().reset_counter()
+        cls._instances = InstanceRegistry(**NodeMeta._registry_options)
+
+    @staticmethod
+    def _get_subclasses() -> List[Node]:
+        subclasses = []
+        pending = [Node]
+        while pending:
+            klass = pending.pop()
+            subclasses.append(klass)
+            pending.extend(klass.__subclasses__())
+        return subclasses
+
+    @classmethod
+    def configure_registry(
+        cls, mode: str = None, maxsize: int = None
+    ) -> None:
+        """
+        Set how node instances are registered for every Node class: "weak",
+        "lru" (with a maxsize), "strong" or "disabled". Any instances already
+        registered are carried over, as far as the new registry allows.
+        """
+        options = {"mode": mode, "maxsize": maxsize}
+        InstanceRegistry(**options)
+        NodeMeta._registry_options = options
+
+        for klass in Node._get_subclasses():
+            instances = klass.__dict__.get("_instances")
+            klass._instances = InstanceRegistry(**options)
+            if instances is not None:
+                for uid, instance in instances._data.items():
+                    klass._instances[uid] = instance
+
+    @classmethod
+    def registry_stats(cls) -> Dict[str, RegistryStats]:
+        """
+        Mapping of registered node names to statistics of their instance
+        registry (size, hits, misses and evictions).
+        """
+        return {x.__name__: x._instances.stats() for x in cls._nodes}
 
     @classmethod
     def _register_node(cls, node: Node) -> None:
         cls._nodes.append(node)
 
+        # A new node may resolve forward references of those already
+        # registered, so every cached annotation table is now stale
+        Node._generation += 1
+
+    @classmethod
+    def _get_registered(cls) -> Dict[str, Node]:
+        """
+        Mapping of names to registered node classes. When two nodes share a
+        name, the most recently registered one wins.
+        """
+        registered = Node._registered
+        if registered is None or registered[0] != Node._generation:
+            registered = (
+                Node._generation,
+                {x.__name__: x for x in Node._nodes},
+            )
+            Node._registered = registered
+        return registered[1]
+
+    @classmethod
+    def _compile_type_hints(
+        cls
+    ) -> Tuple[int, Dict[str, Any], Dict[str, PropType]]:
+        localns = dict(cls._get_registered())
+        localns.update({"List": List, "Union": Union, "Tuple": Tuple})
+        annotations = get_type_hints(
+            cls, globalns=globals(), localns=localns
+        )
+
+        predicates = {}
+        for pred, prop_type in annotations.items():
+            list_type = is_list_type(prop_type)
+            if (
+                isinstance(prop_type, _GenericAlias)
+                and prop_type.__origin__ in ACCEPTABLE_GENERIC_ALIASES
+            ):
+                prop_type = prop_type.__args__[0]
+            predicates[pred] = PropType(
+                prop_type, list_type, cls._directives.get(pred, ())
+            )
+
+        return Node._generation, annotations, predicates
+
+    @classmethod
+    def _get_annotations(cls) -> Dict[str, Any]:
+        """
+        Resolved type hints of the class. They are compiled once and shared
+        by all instances until another node class is registered.
+        """
+        type_hints = cls.__dict__.get("_type_hints")
+        if type_hints is None or type_hints[0] != Node._generation:
+            type_hints = cls._compile_type_hints()
+            cls._type_hints = type_hints
+        return type_hints[1]
+
+    @classmethod
+    def _get_predicates(cls) -> Dict[str, PropType]:
+        """
+        Same as _get_annotations, but with the inner type of any generic
+        alias already extracted, and whether it is a list type.
+        """
+        cls._get_annotations()
+        return cls._type_hints[2]
+
+    @classmethod
+    def _get_serializer(
+        cls, json: bool = False
+    ) -> Dict[str, Optional[Callable[[Any], Any]]]:
+        """
+        Mapping of predicates to the formatter of their N-Quad objects (or
+        JSON values), or to None for edges to other nodes. Compiled
+        alongside the type hints.
+        """
+        serializer = cls.__dict__.get("_serializer")
+        if serializer is None or serializer[0] != Node._generation:
+            nquads, json_values = {}, {}
+            for pred, prop_type in cls._get_predicates().items():
+                prop_type = prop_type.prop_type
+                if Node._is_node_type(prop_type):
+                    nquads[pred] = json_values[pred] = None
+                else:
+                    nquads[pred] = _FORMATTERS.get(prop_type, _format_literal)
+                    json_values[pred] = _JSON_FORMATTERS.get(
+                        prop_type, _json_literal
+                    )
+            serializer = (Node._generation, nquads, json_values)
+            cls._serializer = serializer
+        return serializer[2] if json else serializer[1]
+
+    @classmethod
+    def _get_upsert_keys(cls) -> Tuple[str, ...]:
+        """
+        Predicates that identify a node when it is upserted: those with an
+        @upsert directive, or else those with an exact index
+        """
+        upserts = tuple(
+            pred
+            for pred, directives in cls._directives.items()
+            if any(isinstance(x, upsert) for x in directives)
+        )
+        if upserts:
+            return upserts
+        return tuple(
+            pred
+            for pred, directives in cls._directives.items()
+            if any(
+                isinstance(x, index) and x.tokenizer is exact
+                for x in directives
+            )
+        )
+
     @classmethod
     def _get_name(cls) -> str:
         return cls.__name__
@@ -328,13 +870,7 @@ class Node(metaclass=NodeMeta):
                 #   predicate. If it is possible, then the solution may simply
                 #   be to loop over a list of deepcopy(annotations.items()),
                 #   and append all the __args__ to that list to extend the iteration
-                # - is_list_type should probably become its own function
-                is_list_type = (
-                    True
-                    if isinstance(prop_type, _GenericAlias)
-                    and prop_type.__origin__ in (list, tuple)
-                    else False
-                )
+                list_type = is_list_type(prop_type)
 
                 if (
                     isinstance(prop_type, _GenericAlias)
@@ -344,7 +880,7 @@ class Node(metaclass=NodeMeta):
 
                 prop_type = PropType(
                     prop_type,
-                    is_list_type,
+                    list_type,
                     node._directives.get(prop_name, []),
                 )
 
@@ -386,7 +922,7 @@ class Node(metaclass=NodeMeta):
                 elif cls._is_node_type(prop_type[0]):
                     edges[prop_name] = PropType(
                         "uid",
-                        is_list_type,
+                        list_type,
                         node._directives.get(prop_name, []),
                     )
                 else:
@@ -437,70 +973,103 @@ class Node(metaclass=NodeMeta):
 
     @classmethod
     def _get_staged(cls):
-        return cls._staged
+        return current_session().staged
 
     @classmethod
     def _clear_staged(cls):
-        cls._staged = {}
-        cls._i = _count()
+        current_session().clear()
 
     @classmethod
     def _hydrate(
-        cls, raw: Dict[str, Any], types: Dict[str, Node] = None
+        cls,
+        raw: Dict[str, Any],
+        types: Dict[str, Node] = None,
+        identity_map: Dict[int, Node] = None,
     ) -> Node:
         # TODO:
         # - Accept types that are passed. Loop thru them and register if needed
         #   and raising an exception if they are not valid.
-        # - This method is another candidate for some refactoring to reduce
-        #   complexity.
         # - Should create a Facets type so that the type annotation of this function
         #   is _hydrate(cls, raw: str, types: Dict[str, Node] = None) -> Union[Node, Facets]
-        registered = {x.__name__: x for x in Node._nodes}
-        localns = {x.__name__: x for x in Node._nodes}
-        localns.update({"List": List, "Union": Union, "Tuple": Tuple})
-
-        if "_type" in raw and raw.get("_type") in registered:
+        registered = Node._get_registered()
+        if identity_map is None:
+            identity_map = current_session().identity_map
+            if identity_map is None:
+                identity_map = {}
+
+        # The raw data is walked once, breadth first, using a queue instead of
+        # recursing for every nested object. An instance is created (or found
+        # in the identity map) as soon as its object is first encountered, so
+        # that parents can reference it before its own predicates are loaded.
+        queue = deque()
+
+        def resolve(raw):
+            if not isinstance(raw, dict):
+                return None
+
+            k = registered.get(raw.get("_type"))
+            if k is None:
+                return None
             if "uid" not in raw:
                 raise InvalidData("Missing uid.")
 
-            k = registered[raw.get("_type")]
+            uid = int(raw["uid"], 16)
+            instance = identity_map.get(uid)
+            k._instances.record(instance is not None)
+            if instance is None:
+                instance = k(uid=uid)
+                identity_map[uid] = instance
+            queue.append((instance, raw))
 
-            keys = deepcopy(list(raw.keys()))
-            facet_data = [
-                (key.split("|")[1], raw.pop(key)) for key in keys if "|" in key
-            ]
+            facet_data = {}
+            for key, value in raw.items():
+                kind, name = _parse_key(key)
+                if kind is _FACET:
+                    facet_data[name] = value
 
-            kwargs = {"uid": int(raw.pop("uid"), 16)}
-            delay = []
-            computed = {}
+            if facet_data:
+                return Facets(instance, **facet_data)
+            return instance
 
-            pred_items = [
-                (pred, value)
-                for pred, value in raw.items()
-                if not pred.startswith("_")
-            ]
+        hydrated = resolve(raw)
 
-            annotations = get_type_hints(
-                k, globalns=globals(), localns=localns
-            )
-            for pred, value in pred_items:
+        while queue:
+            instance, raw = queue.popleft()
+            annotations = instance.__class__._get_predicates()
+            values = {}
+            computed = {}
+
+            for pred, value in raw.items():
                 """
                 The pred falls into one of three categories:
                 1. predicates that have already been defined
                 2. predicates that are a reverse of a relationship
                 3. predicates that are used for some computed value
                 """
-                if pred in annotations:
+                kind, name = _parse_key(pred)
+                if kind is _SKIP or kind is _FACET:
+                    continue
+                elif kind is _REVERSE:
+                    if isinstance(value, dict):
+                        value = [value]
+                    elif not isinstance(value, list):
+                        continue
+
+                    for x in value:
+                        item = resolve(x)
+                        if is_facets(item):
+                            facets = item._asdict()
+                            facets["obj"] = instance
+                            item.obj._load(**{name: Facets(**facets)})
+                        elif item is not None:
+                            item._load(**{name: instance})
+                elif pred in annotations:
                     if isinstance(value, list):
-                        prop_type = annotations[pred]
-                        is_list_type = (
-                            True
-                            if isinstance(prop_type, _GenericAlias)
-                            and prop_type.__origin__ in (list, tuple)
-                            else False
-                        )
-                        if is_list_type:
-                            value = [cls._hydrate(x) for x in value]
+                        if annotations[pred].is_list_type:
+                            value = LoadedList(
+                                resolve(x) if isinstance(x, dict) else x
+                                for x in value
+                            )
                         else:
                             if len(value) > 1:
                                 # This should NOT happen. Because uid
@@ -511,61 +1080,57 @@ class Node(metaclass=NodeMeta):
                                 # be List[MyNode]
                                 # Will probably need to be revisited when
                                 # Dgraph v. 1.1 is released
-                                raise Exception("Unknown data")
-                            node = get_node(value[0].get("_type"))
-                            value = node._hydrate(value[0])
+                                raise InvalidData(
+                                    f"Expected a single value for {pred}."
+                                )
+                            value = resolve(value[0])
                     elif isinstance(value, dict):
-                        prop_type = annotations[pred]
-                        if prop_type != geo:
-                            value = cls._hydrate(value)
+                        if annotations[pred].prop_type != geo:
+                            value = resolve(value)
 
                     if value is not None:
-                        kwargs.update({pred: value})
-                elif pred.startswith("~"):
-                    p = pred[1:]
-                    if isinstance(value, list):
-                        for x in value:
-                            keys = deepcopy(list(x.keys()))
-                            value_facet_data = [
-                                (k.split("|")[1], x.pop(k))
-                                for k in keys
-                                if "|" in k
-                            ]
-                            item = get_node(x.get("_type"))._hydrate(x)
-
-                            if value_facet_data:
-                                item = Facets(item, **dict(value_facet_data))
-                            delay.append((item, p, value_facet_data))
-                    elif isinstance(value, dict):
-                        delay.append(
-                            (
-                                get_node(value.get("_type"))._hydrate(value),
-                                p,
-                                None,
-                            )
-                        )
+                        values[pred] = value
                 else:
                     if pred.endswith("_uid"):
                         value = int(value, 16)
-                    computed.update({pred: value})
-
-            instance = k(**kwargs)
-            for d, p, v in delay:
-                if is_facets(d):
-                    f = Facets(instance, **dict(v))
-                    setattr(d.obj, p, f)
-                else:
-                    setattr(d, p, instance)
+                    computed[pred] = value
 
+            instance._load(**values)
             if computed:
-                instance.computed = Computed(**computed)
+                instance._load(computed=Computed(**computed))
 
-            if facet_data:
-                facets = Facets(instance, **dict(facet_data))
-                return facets
-            else:
-                return instance
-        return None
+        return hydrated
+
+    def _load(self, **kwargs) -> None:
+        """
+        Assign hydrated values without marking them as dirty. They are what
+        is stored in Dgraph, so nothing is copied until they are changed.
+        """
+        init, self._init = self._init, False
+        try:
+            for pred, value in kwargs.items():
+                if type(value) is list:
+                    value = LoadedList(value)
+                setattr(self, pred, value)
+                if self._snapshot_dict:
+                    self._snapshot_dict.pop(pred, None)
+                if self._dirty_set:
+                    self._dirty_set.discard(pred)
+        finally:
+            self._init = init
+
+    def _take_snapshot(self, pred: str) -> None:
+        """
+        Remember the stored value of a predicate before it is first replaced
+        """
+        value = getattr(self, pred, None)
+        if isinstance(value, LoadedList) and value._original is not None:
+            value = value._original
+        elif isinstance(value, list):
+            # Lists are copied into a tuple, which later changes to the
+            # list cannot affect. Anything else is replaced, not modified.
+            value = tuple(value)
+        self._snapshot[pred] = value
 
     @classmethod
     def json(cls) -> Dict[str, List[Node]]:
@@ -609,7 +1174,7 @@ class Node(metaclass=NodeMeta):
         if is_facets(instance):
             data = list(instance._asdict().items())
         else:
-            data = list(instance.__dict__.items())
+            data = instance._get_values()
         if include:
             for prop in include:
                 data.append((prop, getattr(instance, prop, None)))
@@ -644,7 +1209,7 @@ class Node(metaclass=NodeMeta):
                         )
                     else:
                         obj[key] = str(value)
-                elif isinstance(value, (list,)):
+                elif isinstance(value, list):
                     explode = (
                         depth < max_depth if max_depth is not None else True
                     )
@@ -662,14 +1227,7 @@ class Node(metaclass=NodeMeta):
                 elif is_computed(value):
                     obj.update({key: value._asdict()})
                 elif is_facets(value):
-                    prop_type = annotations[key]
-                    is_list_type = (
-                        True
-                        if isinstance(prop_type, _GenericAlias)
-                        and prop_type.__origin__ in (list, tuple)
-                        else False
-                    )
-                    if is_list_type:
+                    if is_list_type(annotations[key]):
                         if key not in obj:
                             obj[key] = []
                         obj[key].append(value._asdict())
@@ -698,9 +1256,200 @@ class Node(metaclass=NodeMeta):
     def _type(self):
         return self.__class__.__name__
 
+    @property
+    def _annotations(self) -> Dict[str, Any]:
+        return self.__class__._get_annotations()
+
+    @property
+    def _dirty(self) -> Set[str]:
+        # Tracking sets are only allocated once something needs tracking
+        if self._dirty_set is None:
+            self._dirty_set = set()
+        return self._dirty_set
+
+    @property
+    def _pending_delete(self) -> Set[Tuple[Optional[str], Any]]:
+        if self._pending_delete_set is None:
+            self._pending_delete_set = set()
+        return self._pending_delete_set
+
+    @property
+    def _snapshot(self) -> Dict[str, Any]:
+        if self._snapshot_dict is None:
+            self._snapshot_dict = {}
+        return self._snapshot_dict
+
+    def _get_values(self) -> List[Tuple[str, Any]]:
+        """
+        (name, value) pairs of everything set on the instance, whether it is
+        stored in a slot or in __dict__.
+        """
+        values = []
+        for slot in self._slotted:
+            try:
+                values.append((slot, object.__getattribute__(self, slot)))
+            except AttributeError:
+                pass
+        values.extend(getattr(self, "__dict__", {}).items())
+        return values
+
     def _generate_uid(self) -> str:
-        i = next(self._i)
-        yield f"unsaved.{i}"
+        yield current_session().next_uid()
+
+    def _format_uid(
+        self, pred: str, obj: Node, staged: Optional[Dict[Any, Node]]
+    ) -> str:
+        """
+        Encode an edge to another node. Unless staged is None, a node that
+        has not been saved must be staged.
+        """
+        uid, passed = _parse_subject(obj.uid)
+        if isinstance(passed, int):
+            return uid
+
+        if staged is not None and uid not in staged and passed not in staged:
+            raise NotStaged(
+                f"<{self.__class__.__name__} {pred}={uid}|"
+                f"{obj.__class__.__name__}>"
+            )
+        return uid
+
+    def _format_object(
+        self,
+        pred: str,
+        obj: Any,
+        staged: Dict[Any, Node],
+        formatter: Callable[[Any], str] = None,
+    ) -> str:
+        """
+        Encode a single value of a predicate as an N-Quad object
+        """
+        if isinstance(obj, Enum):
+            obj = obj.value
+        if isinstance(obj, Node):
+            return self._format_uid(pred, obj, staged)
+
+        if formatter is None:
+            formatter = self._get_serializer().get(pred) or _format_literal
+        try:
+            return formatter(obj)
+        except ValueError:
+            annotation = self._get_predicates()[pred].prop_type
+            raise ValueError(
+                f"Incorrect value type. Received "
+                f"<{self.__class__.__name__} {pred}={obj}>. Expecting "
+                f"<{self.__class__.__name__} {pred}={annotation.__name__}>"
+            )
+
+    def _serialize(
+        self,
+        subject: str,
+        items: Iterable[Tuple[str, Any]],
+        staged: Dict[Any, Node],
+        lines: List[str],
+        deleted: List[str] = None,
+    ) -> None:
+        """
+        Append the N-Quad line of every value of the (predicate, value) items
+        to lines. For values that are None, the predicate is appended to
+        deleted instead, when it is given.
+        """
+        serializer = self._get_serializer()
+        append = lines.append
+
+        for pred, value in items:
+            formatter = serializer.get(pred) or _format_literal
+            prefix = f"{subject} <{pred}> "
+            if value.__class__ is not list:
+                value = (value,)
+
+            for o in value:
+                # Plain values skip every other check
+                if o.__class__ in _SCALAR_TYPES:
+                    try:
+                        append(prefix + formatter(o) + " .")
+                    except ValueError:
+                        # Raises, with a more helpful message
+                        self._format_object(pred, o, staged)
+                    continue
+
+                suffix = " ."
+                if isinstance(o, tuple) and is_facets(o):
+                    facets = ", ".join(
+                        f"{facet}={_raw_value(getattr(o, facet))}"
+                        for facet in o._fields[1:]
+                    )
+                    suffix = f" ({facets}) ."
+                    o = o.obj
+
+                for output in (
+                    o if isinstance(o, (list, tuple, set)) else (o,)
+                ):
+                    if output is None:
+                        if deleted is not None:
+                            deleted.append(pred)
+                        continue
+                    append(
+                        prefix
+                        + self._format_object(pred, output, staged, formatter)
+                        + suffix
+                    )
+
+    def _serialize_json(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        staged: Dict[Any, Node],
+        obj: Dict[str, Any],
+        deleted: List[str] = None,
+    ) -> None:
+        """
+        Same as _serialize, but set the value of each predicate on the object
+        of a JSON (set_json) mutation. Edges become {"uid": ...} objects, and
+        facets are set as "predicate|facet" keys.
+        """
+        serializer = self._get_serializer(json=True)
+
+        for pred, value in items:
+            formatter = serializer.get(pred) or _json_literal
+            many = isinstance(value, list)
+            out = []
+
+            for o in value if many else (value,):
+                facets = None
+                if isinstance(o, tuple) and is_facets(o):
+                    facets = {
+                        f"{pred}|{facet}": _json_literal(getattr(o, facet))
+                        for facet in o._fields[1:]
+                    }
+                    o = o.obj
+
+                for output in (
+                    o if isinstance(o, (list, tuple, set)) else (o,)
+                ):
+                    if output is None:
+                        if deleted is not None:
+                            deleted.append(pred)
+                        continue
+
+                    if isinstance(output, Enum):
+                        output = output.value
+                    if isinstance(output, Node):
+                        ref = self._format_uid(pred, output, staged)
+                        output = {"uid": _json_ref(ref)}
+                        if facets:
+                            output.update(facets)
+                    else:
+                        try:
+                            output = formatter(output)
+                        except (TypeError, ValueError):
+                            # Raises, with a more helpful message
+                            self._format_object(pred, output, staged)
+                        if facets:
+                            obj.update(facets)
+                    out.append(output)
+
+            if out:
+                obj[pred] = out if many or len(out) > 1 else out[0]
 
     def to_json(self, include: List[str] = None, **kwargs) -> Dict[str, Any]:
         # TODO:
@@ -708,187 +1457,462 @@ class Node(metaclass=NodeMeta):
         #   would make more sense.
         return self.__class__._explode(self, include=include, **kwargs)
 
+    def dumps(
+        self, include: List[str] = None, codec: str = None, **kwargs
+    ) -> str:
+        """
+        Encode the exploded node as a JSON string, using the configured
+        codec unless another one is named.
+        """
+        data = self.to_json(include=include, **kwargs)
+        return _codec.dumps(data, codec=codec)
+
     def stage(self, *args) -> None:
         """
         Identify a node instance that it is primed and ready to be migrated
         """
-        self.edges = {}
+        self.edges = self._get_edges(*args)
+        current_session().stage(self)
 
+    def _get_edges(self, *args) -> Dict[str, Any]:
+        """
+        The values of the predicates of the node (or only those of args)
+        that are set, as they are migrated
+        """
+        edges = {}
         for arg, _ in self._annotations.items():
             if not arg.startswith("_") and arg != "uid":
                 val = getattr(self, arg, None)
                 if val is not None and (not args or arg in args):
-                    self.edges[arg] = val
-        self._staged[self.uid] = self
+                    edges[arg] = val
+        return edges
 
     def delete(self, node=None, pred: str = None) -> None:
-        if not pred:
-            pred = "*"
+        """
+        Mark values of the node to be deleted when it is saved: the edge of
+        pred to node, every value of pred when no node is given, or all of
+        its predicates when neither is given.
+        """
+        self._pending_delete.add((pred, None if node is None else node.uid))
+
+    def _delete_nquads(self, subject: str) -> List[str]:
+        lines = []
+        for pred, target in self._pending_delete:
+            pred = f"<{pred}>" if pred else "*"
+            target = _parse_subject(target)[0] if target is not None else "*"
+            lines.append(f"{subject} {pred} {target} .")
+        return lines
+
+    def _delete_json(self, ref: str) -> List[Dict[str, Any]]:
+        objs = []
+        for pred, target in self._pending_delete:
+            if pred is None and target is not None:
+                raise ValueError(
+                    "Deleting an edge to a node with a JSON mutation needs a "
+                    "predicate"
+                )
+            obj = {"uid": ref}
+            if pred is not None:
+                obj[pred] = (
+                    None
+                    if target is None
+                    else {"uid": _json_ref(_parse_subject(target)[0])}
+                )
+            objs.append(obj)
+        return objs
+
+    def _changes(
+        self, staged: Dict[Any, Node], json: bool = False
+    ) -> Tuple[Any, List[Any]]:
+        """
+        The set and delete mutations of the changes made to the node: every
+        value of a fresh node, or the dirty predicates of one that already
+        exists, and its pending deletes.
+
+        Returns N-Quad lines for both, or with json, the set_json object
+        (None when there is nothing to set) and delete_json objects.
+        """
+        predicates = self._get_predicates()
+        subject, passed = _parse_subject(self.uid)
+        ref = _json_ref(subject)
+
+        snapshot = dict(self._snapshot_dict or ())
+        if not self._fresh:
+            # Loaded lists that were changed in place
+            for pred, value in self._get_values():
+                if (
+                    isinstance(value, LoadedList)
+                    and value._original is not None
+                    and pred not in snapshot
+                ):
+                    snapshot[pred] = value._original
+        if self._fresh:
+            changed = [
+                pred
+                for pred in predicates
+                if not pred.startswith("_")
+                and pred != "uid"
+                and getattr(self, pred, None) is not None
+            ]
         else:
-            pred = f"<{pred}>"
+            # Lists may have been changed in place, without being assigned
+            changed = [
+                pred
+                for pred in self._dirty
+                if pred != "computed" and pred in predicates
+            ]
+            changed.extend(
+                pred
+                for pred, old in snapshot.items()
+                if isinstance(old, tuple) and pred not in self._dirty
+            )
 
-        if not node:
-            node = "*"
+        if json:
+            setters = {"uid": ref}
+            deleters = self._delete_json(ref)
+            if self._fresh:
+                setters[self._type] = True
+                setters["_type"] = self._type
         else:
-            node = f"<{node.uid}>"
+            setters = []
+            deleters = self._delete_nquads(subject)
+            if self._fresh:
+                setters.append(f'{subject} <{self._type}> "true" .')
+                setters.append(f'{subject} <_type> "{self._type}" .')
+
+        def serialize(items, lines, deleted=None):
+            if json:
+                self._serialize_json(items, staged, lines, deleted)
+            else:
+                self._serialize(subject, items, staged, lines, deleted)
+
+        # Values to delete one by one. For JSON, they are collected on a
+        # single delete_json object.
+        removals = {"uid": ref} if json else deleters
+        deleted = []
+        for pred in changed:
+            value = getattr(self, pred, None)
+            is_node_type = self._is_node_type(predicates[pred].prop_type)
+
+            if pred in snapshot and value is not None:
+                old = snapshot[pred]
+                if isinstance(old, tuple):
+                    # Only send the edges or values that were added and
+                    # removed since the snapshot
+                    added, removed = _list_delta(old, value)
+                    if added:
+                        serialize(((pred, added),), setters)
+                    if removed:
+                        serialize(((pred, removed),), removals)
+                    continue
+                elif _value_key(old) == _value_key(value):
+                    continue
+                elif old is not None and is_node_type:
+                    serialize(((pred, _unwrap_facets(old)),), removals)
+                    serialize(((pred, value),), setters)
+                    continue
+
+            # Until dgraph 1.1 with 1:1 uid, the old edge of a single node
+            # predicate is dropped first. Dgraph applies the deletes of a
+            # mutation before its sets, so this is done in the same one.
+            if (
+                value is not None
+                and not self._fresh
+                and not predicates[pred].is_list_type
+                and is_node_type
+            ):
+                deleted.append(pred)
 
-        self._pending_delete.add(f"<{self.uid}> {pred} {node} .")
+            serialize(((pred, value),), setters, deleted)
 
-    def save(
-        self,
-        client: PyDiggyClient = None,
-        host: str = None,
-        port: int = None,
-        commit: bool = True,
-    ) -> None:
-        # TODO:
-        # - User self._annotations
-        localns = {x.__name__: x for x in Node._nodes}
-        localns.update({"List": List, "Union": Union, "Tuple": Tuple})
-        annotations = get_type_hints(self, globalns=globals(), localns=localns)
+        if json:
+            if len(removals) > 1:
+                deleters.append(removals)
+            deleters.extend({"uid": ref, pred: None} for pred in deleted)
+            if len(setters) == 1:
+                setters = None
+        else:
+            deleters.extend(f"{subject} <{pred}> * ." for pred in deleted)
 
-        if client is None:
-            client = get_client(host=host, port=9080)
+        return setters, deleters
 
-        def _make_obj(node, pred, obj):
-            annotation = annotations.get(pred, "")
-            if (
-                hasattr(annotation, "__origin__")
-                and annotation.__origin__ == list
-            ):
-                annotation = annotation.__args__[0]
+    def _mark_saved(self, uids: Dict[str, str]) -> None:
+        """
+        Once committed, take the uid assigned to a fresh node and forget
+        its changes
+        """
+        label = str(self.uid)
+        if label in uids:
+            uid = int(uids[label], 16)
+            registry = self.__class__._instances
+            if registry.get(label) is self:
+                del registry[label]
+            self._load(uid=uid)
+            registry[uid] = self
+
+        # What was saved is now what is stored in Dgraph. Lists that are not
+        # loaded ones cannot tell when they change, so they are copied.
+        self._snapshot_dict = None
+        preds = self._get_predicates()
+        for pred, value in self._get_values():
+            if isinstance(value, LoadedList):
+                value._original = None
+            elif isinstance(value, list) and pred in preds:
+                self._snapshot[pred] = tuple(value)
+
+        self._fresh = False
+        self._dirty_set = None
+        self._pending_delete_set = None
 
-            try:
-                # if annotation == str or pred == "_type":
-                if annotation == str:
-                    obj = f'"{obj}"'
-                elif annotation == bool:
-                    obj = f'"{str(obj).lower()}"'
-                elif annotation in (int,):
-                    obj = f'"{int(obj)}"^^<xs:int>'
-                elif annotation in (float,) or isinstance(obj, float):
-                    obj = f'"{obj}"^^<xs:float>'
-                elif annotation in (geo,):
-                    if hasattr(obj, "__geojson__"):
-                        obj = obj.__geojson__()
-                    obj = f'"{obj}"^^<geo:geojson>'
-                elif Node._is_node_type(obj.__class__):
-                    obj, passed = _parse_subject(obj.uid)
-                    staged = Node._get_staged()
-
-                    if (
-                        obj not in staged
-                        and passed not in staged
-                        and not isinstance(passed, int)
-                    ):
-                        raise NotStaged(
-                            f"<{node.__class__.__name__} {pred}={obj}>"
-                        )
-            except ValueError:
-                raise ValueError(
-                    f"Incorrect value type. Received <{node.__class__.__name__} {pred}={obj}>. Expecting <{node.__class__.__name__} {pred}={annotation.__name__}>"
-                )
+    @classmethod
+    def _get_selection(cls, depth: int) -> List[str]:
+        """
+        The lines of a DQL selection of the predicates of the class, and of
+        the nodes that it has edges to, depth levels deep. Deeper than that,
+        edges only select the uid (and _type) of their nodes.
+        """
+        lines = ["uid", "_type"]
+        for pred, prop_type in cls._get_predicates().items():
+            target = prop_type.prop_type
+            if pred == "uid":
+                continue
+            elif not Node._is_node_type(target):
+                lines.append(pred)
+            elif depth > 0:
+                inner = target._get_selection(depth - 1)
+                lines.append(f"{pred} @facets {{")
+                lines.extend(f"    {x}" for x in inner)
+                lines.append("}")
+            else:
+                lines.append(f"{pred} @facets {{ uid _type }}")
+        return lines
 
-            if isinstance(obj, (tuple, set)):
-                obj = list(obj)
+    @classmethod
+    def get_many(
+        cls,
+        uids: Iterable[Any],
+        depth: int = 1,
+        chunk_size: int = None,
+        workers: int = None,
+        client: PyDiggyClient = None,
+        host: str = None,
+        port: int = None,
+        identity_map: Dict[int, Node] = None,
+        codec: str = None,
+    ) -> Dict[int, Node]:
+        """
+        Load the nodes of the class with the given uids, and the nodes that
+        they have edges to, depth levels deep. The query is generated from
+        the annotations of the class.
 
-            return obj
+        The uids are queried chunk_size at a time, with one uid(...) query per
+        chunk, over a pool of workers threads. All of the chunks are hydrated
+        into a single identity map: the one passed in, or that of the current
+        session, or else a new one.
 
-        setters = []
-        deleters = list(self._pending_delete)
+        Returns the nodes by uid, in the order of uids. Uids that are not a
+        node of the class are left out.
+        """
+        ordered = []
+        seen = set()
+        for uid in uids:
+            _, uid = _parse_subject(uid)
+            if not isinstance(uid, int):
+                raise ValueError(f"Not a uid: {uid!r}.")
+            if uid not in seen:
+                seen.add(uid)
+                ordered.append(uid)
+        if not ordered:
+            return {}
 
-        saveable = [
-            x for x in self._dirty if x != "computed" and x in annotations
+        if client is None:
+            options = {"host": host, "port": port}
+            client = get_client(
+                **{k: v for k, v in options.items() if v is not None}
+            )
+        if identity_map is None:
+            identity_map = current_session().identity_map
+            if identity_map is None:
+                identity_map = {}
+
+        chunk_size = chunk_size or DEFAULT_GET_MANY_CHUNK_SIZE
+        chunks = [
+            ordered[i : i + chunk_size]
+            for i in range(0, len(ordered), chunk_size)
         ]
+        selection = "\n".join(f"    {x}" for x in cls._get_selection(depth))
+        name = cls._get_name()
 
-        subject, passed = _parse_subject(self.uid)
-        if self._fresh:
-            line = f'{subject} <{self._type}> "true" .'
-            setters.append(line)
-            line = f'{subject} <_type> "{self._type}" .'
-            setters.append(line)
-
-        for pred in saveable:
-            obj = getattr(self, pred)
-            if not isinstance(obj, list):
-                obj = [obj]
-
-            for o in obj:
-                if issubclass(o.__class__, Enum):
-                    o = o.value
-
-                facets = []
-                if is_facets(o):
-                    for facet in o.__class__._fields[1:]:
-                        val = _raw_value(getattr(o, facet))
-                        facets.append(f"{facet}={val}")
-                    o = o.obj
+        def fetch(chunk):
+            qry = (
+                f"{{\n  nodes(func: uid({', '.join(map(hex, chunk))})) "
+                f"@filter(has({name})) {{\n{selection}\n  }}\n}}"
+            )
+            data = _codec.loads(client.query(qry).json, codec=codec)
+            return data.get("nodes", [])
+
+        found = {}
+        workers = min(workers or DEFAULT_GET_MANY_WORKERS, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Responses are decoded by the workers, but hydrated here, as the
+            # identity map is not safe to share between threads
+            for raws in executor.map(fetch, chunks):
+                for raw in raws:
+                    node = cls._hydrate(raw, identity_map=identity_map)
+                    if node is not None:
+                        found[node.uid] = node
+
+        return {uid: found[uid] for uid in ordered if uid in found}
 
-                if not isinstance(o, (list, tuple, set)):
-                    out = [o]
-                else:
-                    out = o
+    @classmethod
+    def save_all(
+        cls,
+        nodes: Iterable[Node],
+        client: PyDiggyClient = None,
+        host: str = None,
+        port: int = None,
+        commit: bool = True,
+        json: bool = False,
+    ) -> Any:
+        """
+        Save the changes made to many nodes in a single transaction. With
+        json, they are sent as a JSON (set_json/delete_json) mutation instead
+        of N-Quads.
+
+        Nodes being saved together may reference each other without being
+        staged. Once committed, fresh nodes are given the uid that Dgraph
+        assigned them. Returns the pydgraph response, or None when there was
+        nothing to save.
+        """
+        nodes = list(nodes)
 
-                for output in out:
-                    if output is None:
-                        line = f"{subject} <{pred}> * ."
-                        deleters.append(line)
-                        continue
+        if client is None:
+            options = {"host": host, "port": port}
+            client = get_client(
+                **{k: v for k, v in options.items() if v is not None}
+            )
 
-                    is_node_type = self._is_node_type(output.__class__)
-                    output = _make_obj(self, pred, output)
-
-                    # Temporary measure until dgraph 1.1 with 1:1 uid
-                    if is_node_type and commit and not self._fresh:
-                        prop_type = annotations[pred]
-                        is_list_type = (
-                            True
-                            if isinstance(prop_type, _GenericAlias)
-                            and prop_type.__origin__ in (list, tuple)
-                            else False
-                        )
-                        if not is_list_type:
-                            line = f"{subject} <{pred}> * ."
-                            transaction = client.txn()
-                            try:
-                                transaction.mutate(del_nquads=line)
-                                transaction.commit()
-                            finally:
-                                transaction.discard()
-
-                    if facets:
-                        facets = ", ".join(facets)
-                        line = f"{subject} <{pred}> {output} ({facets}) ."
-                    else:
-                        line = f"{subject} <{pred}> {output} ."
-                    setters.append(line)
+        mutation = cls._save_mutation(nodes, json)
+        if mutation is None:
+            return None
 
-        set_mutations = "\n\t".join(setters)
-        delete_mutations = "\n\t".join(deleters)
         transaction = client.txn()
+        try:
+            o = transaction.mutate(**mutation)
 
-        print(
-            f"Ready for operation: {len(setters)} setters, {len(deleters)} deleters"
-        )
+            if commit:
+                transaction.commit()
+                uids = getattr(o, "uids", None) or {}
+                for node in nodes:
+                    node._mark_saved(uids)
+        finally:
+            if commit:
+                transaction.discard()
+                _cache.invalidate(*mutation.values())
+        return o
 
-        try:
-            if set_mutations or delete_mutations:
-                print("~ set_mutations")
-                print("\t" + (set_mutations if set_mutations else "NONE"))
-                print("~ delete_mutations")
-                print(
-                    "\t" + (delete_mutations if delete_mutations else "NONE")
-                )
-                o = transaction.mutate(
-                    set_nquads=set_mutations, del_nquads=delete_mutations
-                )
+    @classmethod
+    async def asave_all(
+        cls,
+        nodes: Iterable[Node],
+        client: Any = None,
+        host: str = None,
+        port: int = None,
+        commit: bool = True,
+        json: bool = False,
+    ) -> Any:
+        """
+        Save the changes made to many nodes in a single transaction, without
+        blocking the event loop. See save_all, and pydiggy.aio for the
+        clients that can be used.
+        """
+        from pydiggy.aio import atransaction
 
-                if commit:
-                    transaction.commit()
+        nodes = list(nodes)
+        mutation = cls._save_mutation(nodes, json)
+        if mutation is None:
+            return None
 
-                    if hasattr(o, "uids"):
-                        if str(self.uid) in o.uids:
-                            self.uid = o.uids.get(self.uid)
+        transaction = atransaction(client, host=host, port=port)
+        try:
+            o = await transaction.mutate(**mutation)
+
+            if commit:
+                await transaction.commit()
+                uids = getattr(o, "uids", None) or {}
+                for node in nodes:
+                    node._mark_saved(uids)
         finally:
             if commit:
-                transaction.discard()
+                await transaction.discard()
+                _cache.invalidate(*mutation.values())
+        return o
+
+    @staticmethod
+    def _save_mutation(nodes: List[Node], json: bool) -> Dict[str, Any]:
+        """
+        The keyword arguments of the mutation that saves the changes made to
+        nodes, or None when there is nothing to save
+        """
+        staged = dict(Node._get_staged())
+        staged.update((node.uid, node) for node in nodes)
+
+        setters, deleters = [], []
+        for node in nodes:
+            node_setters, node_deleters = node._changes(staged, json=json)
+            if not json:
+                setters.extend(node_setters)
+            elif node_setters:
+                setters.append(node_setters)
+            deleters.extend(node_deleters)
+
+        if not setters and not deleters:
+            return None
+
+        if json:
+            return {"mutation": json_mutation(setters, deleters)}
+        return {
+            "set_nquads": "\n".join(setters),
+            "del_nquads": "\n".join(deleters),
+        }
+
+    def save(
+        self,
+        client: PyDiggyClient = None,
+        host: str = None,
+        port: int = None,
+        commit: bool = True,
+        json: bool = False,
+    ) -> None:
+        """
+        Save the changes made to the node. See save_all.
+        """
+        self.__class__.save_all(
+            (self,),
+            client=client,
+            host=host,
+            port=port,
+            commit=commit,
+            json=json,
+        )
+
+    async def asave(
+        self,
+        client: Any = None,
+        host: str = None,
+        port: int = None,
+        commit: bool = True,
+        json: bool = False,
+    ) -> None:
+        """
+        Save the changes made to the node, without blocking the event loop.
+        See asave_all.
+        """
+        await self.__class__.asave_all(
+            (self,),
+            client=client,
+            host=host,
+            port=port,
+            commit=commit,
+            json=json,
+        )
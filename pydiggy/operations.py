@@ -1,158 +1,434 @@
-import json as _json
+import gzip
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Tuple, Union, get_type_hints
-
+from hashlib import blake2b
+from io import TextIOBase
+from itertools import count as _count
+from os import environ
+from threading import Lock
+from time import perf_counter
+from typing import (IO, Any, Callable, Dict, Iterable, Iterator, List, Tuple,
+                    Union)
+
+import pydgraph
+
+from pydiggy import cache as _cache
+from pydiggy import codec as _codec
+from pydiggy.cache import QueryCache, query_predicates
+from pydiggy.columnar import hydrate_columns
 from pydiggy._types import *  # noqa
-from pydiggy.connection import PyDiggyClient, get_client
-from pydiggy.exceptions import NotStaged
-from pydiggy.node import Node
-from pydiggy.utils import _parse_subject, _raw_value
+from pydiggy.connection import PyDiggyClient, get_client, json_mutation
+from pydiggy.exceptions import MissingAttribute
+from pydiggy.node import Node, _json_ref
+from pydiggy.session import current_session
+from pydiggy.stream import DEFAULT_CHUNK_SIZE, iter_blocks
+from pydiggy.utils import _parse_subject
 
 
-def _make_obj(node, pred, obj):
-    localns = {x.__name__: x for x in Node._nodes}
-    localns.update({"List": List, "Union": Union, "Tuple": Tuple})
-    annotations = get_type_hints(node, globalns=globals(), localns=localns)
-    annotation = annotations.get(pred, "")
-    if hasattr(annotation, "__origin__") and annotation.__origin__ == list:
-        annotation = annotation.__args__[0]
+def _make_obj(node: Node, pred: str, obj: Any) -> str:
+    """
+    Encode a single value of a predicate as an N-Quad object
+    """
+    return node._format_object(pred, obj, Node._get_staged())
 
-    if issubclass(obj.__class__, Enum):
-        obj = obj.value
 
-    # TODO:
-    # - integreate utils._rdf_value
-    try:
-        if Node._is_node_type(obj.__class__):
-            uid, passed = _parse_subject(obj.uid)
-            staged = Node._get_staged()
-
-            if (
-                uid not in staged
-                and passed not in staged
-                and not isinstance(passed, int)
-            ):
-                raise NotStaged(
-                    f"<{node.__class__.__name__} {pred}={uid}|{obj.__class__.__name__}>"
-                )
-            else:
-                try:
-                    uid = hex(int(obj.uid))
-                    obj = f"<{uid}>"
-                except ValueError:
-                    obj = f"_:{obj.uid}"
-        elif annotation == bool:
-            obj = f'"{str(obj).lower()}"'
-        elif annotation in (int,):
-            obj = f'"{int(obj)}"^^<xs:int>'
-        elif annotation in (geo,):
-            if hasattr(obj, "__geojson__"):
-                obj = obj.__geojson__()
-            obj = f'"{obj}"^^<geo:geojson>'
-        elif annotation in (float,) or isinstance(obj, float):
-            obj = f'"{obj}"^^<xs:float>'
-        elif isinstance(obj, datetime):
-            obj = f'"{obj.isoformat()}"'
-        else:
-            obj = f'"{obj}"'
-    except ValueError:
-        raise ValueError(
-            f"Incorrect value type. Received <{node.__class__.__name__} {pred}={obj}>. Expecting <{node.__class__.__name__} {pred}={annotation.__name__}>"
-        )
+DEFAULT_MUTATION_CHUNK_SIZE = 1024 * 1024
+DEFAULT_DEDUP_SIZE = int(environ.get("PYDIGGY_DEDUP_SIZE", 0))
 
-    if isinstance(obj, (tuple, set)):
-        obj = list(obj)
 
-    return obj
+def _node_nquads(
+    uid: Any,
+    node: Node,
+    staged: Dict[Any, Node] = None,
+    strict: bool = True,
+    edges: Dict[str, Any] = None,
+) -> List[str]:
+    """
+    The N-Quad lines of a single staged node, or of any node when its edges
+    are given. Unless strict, edges to unsaved nodes are not checked to be
+    staged.
+    """
+    subject, passed = _parse_subject(uid)
+    if not strict:
+        staged = None
+    elif staged is None:
+        staged = Node._get_staged()
+
+    lines = [
+        f'{subject} <{node.__class__.__name__}> "true" .',
+        f'{subject} <_type> "{node.__class__.__name__}" .',
+    ]
+    if edges is None:
+        edges = node.edges
+    node._serialize(subject, edges.items(), staged, lines)
+    return lines
+
+
+def _chunk_lines(
+    lines: Iterable[str], chunk_size: int, encode: bool = True
+) -> Iterator[Union[str, bytes]]:
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            chunk = "\n".join(buffer) + "\n"
+            yield chunk.encode("utf-8") if encode else chunk
+            buffer = []
+            size = 0
+
+    if buffer:
+        chunk = "\n".join(buffer) + "\n"
+        yield chunk.encode("utf-8") if encode else chunk
+
+
+class Deduplicator:
+    """
+    Drop N-Quad lines (subject, predicate, object and facets) that were
+    already seen, and count how many were kept and removed. A 16 byte digest
+    of every kept line is remembered (about 100 bytes each, with the set),
+    so one instance can span several mutations.
+
+    :param maxsize: Remember at most this many lines, forgetting the oldest
+        first. Duplicates further apart than that are then kept.
+    """
+
+    def __init__(self, maxsize: int = None) -> None:
+        self.maxsize = DEFAULT_DEDUP_SIZE if maxsize is None else maxsize
+        self.seen = {}
+        self.kept = 0
+        self.removed = 0
+
+    def __repr__(self):
+        return f"<Deduplicator kept={self.kept} removed={self.removed}>"
+
+    def __call__(self, lines: Iterable[str]) -> Iterator[str]:
+        # A dict, rather than a set, keeps the digests in order of insertion
+        seen = self.seen
+        for line in lines:
+            digest = blake2b(line.encode("utf-8"), digest_size=16).digest()
+            if digest in seen:
+                self.removed += 1
+                continue
+            seen[digest] = None
+            if self.maxsize and len(seen) > self.maxsize:
+                del seen[next(iter(seen))]
+            self.kept += 1
+            yield line
+
+
+def iter_mutation(
+    chunk_size: int = None, dedup: Union[bool, Deduplicator] = False
+) -> Iterator[Union[str, bytes]]:
+    """
+    Retrieve staged instances and lazily generate the mutation query, one
+    N-Quad line at a time. When a chunk_size is given, it instead yields
+    newline terminated, utf-8 encoded chunks of about chunk_size bytes.
 
+    Staged instances are cleared once the generator is exhausted.
 
-def generate_mutation() -> str:
+    :param dedup: Drop duplicate triples. Pass a Deduplicator to read how
+        many were removed, or to bound its memory. Otherwise it remembers a
+        digest of every line, which costs about 100 bytes per line (up to
+        PYDIGGY_DEDUP_SIZE lines, when set).
+    """
+    staged = Node._get_staged()
+    lines = (
+        line
+        for uid, node in staged.items()
+        for line in _node_nquads(uid, node, staged)
+    )
+    if dedup:
+        if not isinstance(dedup, Deduplicator):
+            dedup = Deduplicator()
+        lines = dedup(lines)
+
+    if chunk_size is None:
+        yield from lines
+    else:
+        yield from _chunk_lines(lines, chunk_size)
+
+    Node._clear_staged()
+
+
+def write_mutation(
+    fp: IO,
+    chunk_size: int = DEFAULT_MUTATION_CHUNK_SIZE,
+    dedup: Union[bool, Deduplicator] = False,
+) -> int:
+    """
+    Write the mutation query of the staged instances to a file-like object,
+    in chunks of about chunk_size. Text and binary files are both supported.
+
+    Returns the number of lines written.
+    """
+    lines = 0
+
+    def counted():
+        nonlocal lines
+        for line in iter_mutation(dedup=dedup):
+            lines += 1
+            yield line
+
+    encode = not isinstance(fp, TextIOBase)
+    for chunk in _chunk_lines(counted(), chunk_size, encode=encode):
+        fp.write(chunk)
+
+    return lines
+
+
+def generate_mutation(dedup: Union[bool, Deduplicator] = False) -> str:
     """
     Retrieve staged instances and generate the mutation query
+
+    :param dedup: Drop duplicate triples (see iter_mutation)
+    """
+    return "\n".join(iter_mutation(dedup=dedup))
+
+
+DEFAULT_SHARD_SIZE = 10_000_000
+
+ShardReport = namedtuple(
+    "ShardReport", ("index", "path", "lines", "bytes", "seconds", "rate")
+)
+
+
+def export_rdf(
+    directory: str,
+    nodes: Iterable[Node] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    prefix: str = "pydiggy",
+    schema: bool = True,
+    strict: bool = None,
+    compresslevel: int = 6,
+    on_shard: Callable[[ShardReport], None] = None,
+) -> List[ShardReport]:
     """
+    Write nodes as gzipped N-Quads, for the Dgraph bulk or live loader.
+
+    The N-Quads are split into files of at most shard_size lines (unless a
+    single node has more), named <prefix>-00000.rdf.gz, <prefix>-00001.rdf.gz
+    and so on. With schema, the schema of the registered nodes is written
+    next to them in <prefix>.schema.
+
+    When nodes is None, the staged nodes are exported (and then cleared).
+    Otherwise, nodes may be any iterable, such as a generator, and only the
+    nodes of one write buffer are held at a time. Edges to unsaved nodes are
+    then not checked to be staged, unless strict is True.
+
+    Returns a ShardReport per file. on_shard is called with each one once
+    its file is complete.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    if schema:
+        path = os.path.join(directory, f"{prefix}.schema")
+        with open(path, "w") as fp:
+            fp.write(Node._generate_schema()[0])
+
     staged = Node._get_staged()
-    # localns = {x.__name__: x for x in Node._nodes}
-    # localns.update({"List": List, "Union": Union, "Tuple": Tuple})
-    # annotations = get_type_hints(Node, globalns=globals(), localns=localns)
+    if nodes is None:
+        items = ((uid, node, node.edges) for uid, node in staged.items())
+        strict = True if strict is None else strict
+    else:
+        # The nodes are not staged, so that none of them is kept once
+        # written
+        items = ((node.uid, node, node._get_edges()) for node in nodes)
+        strict = bool(strict)
+
+    reports = []
+    buffer = []
+    fp = None
+    path = None
+    lines = 0
+    size = 0
+    start = None
+
+    def write():
+        nonlocal size
+        if buffer:
+            chunk = ("\n".join(buffer) + "\n").encode("utf-8")
+            fp.write(chunk)
+            size += len(chunk)
+            buffer.clear()
+
+    def close():
+        nonlocal fp
+        write()
+        fp.close()
+        fp = None
+        seconds = perf_counter() - start
+        report = ShardReport(
+            len(reports),
+            path,
+            lines,
+            size,
+            seconds,
+            lines / seconds if seconds else float("inf"),
+        )
+        reports.append(report)
+        if on_shard is not None:
+            on_shard(report)
 
-    # query = ['{', '\tset {']
-    query = list()
+    for uid, node, edges in items:
+        node_lines = _node_nquads(uid, node, staged, strict, edges)
 
-    for uid, node in staged.items():
-        subject, passed = _parse_subject(uid)
+        # The lines of a node are kept in the same file
+        if fp is not None and lines + len(node_lines) > shard_size:
+            close()
+        if fp is None:
+            path = os.path.join(
+                directory, f"{prefix}-{len(reports):05}.rdf.gz"
+            )
+            fp = gzip.open(path, "wb", compresslevel=compresslevel)
+            lines = size = 0
+            start = perf_counter()
 
-        edges = node.edges
+        buffer.extend(node_lines)
+        lines += len(node_lines)
+        if len(buffer) >= 10_000:
+            write()
 
-        line = f'{subject} <{node.__class__.__name__}> "true" .'
-        query.append(line)
-        line = f'{subject} <_type> "{node.__class__.__name__}" .'
-        query.append(line)
-
-        for pred, obj in edges.items():
-            # annotation = annotations.get(pred, "")
-            if not isinstance(obj, list):
-                obj = [obj]
-
-            for o in obj:
-                facets = []
-                if isinstance(o, tuple) and hasattr(o, "obj"):
-                    for facet in o.__class__._fields[1:]:
-                        val = _raw_value(getattr(o, facet))
-                        facets.append(f"{facet}={val}")
-                    o = o.obj
-
-                if not isinstance(o, (list, tuple, set)):
-                    out = [o]
-                else:
-                    out = o
+    if fp is not None:
+        close()
 
-                for output in out:
-                    output = _make_obj(node, pred, output)
+    if nodes is None:
+        Node._clear_staged()
 
-                    if facets:
-                        facets = ", ".join(facets)
-                        line = f"{subject} <{pred}> {output} ({facets}) ."
-                    else:
-                        line = f"{subject} <{pred}> {output} ."
-                    query.append(line)
+    return reports
 
-    query = "\n".join(query)
-    Node._clear_staged()
 
-    return query
+def _node_json(
+    uid: Any, node: Node, staged: Dict[Any, Node] = None
+) -> Dict[str, Any]:
+    """
+    The object of a single staged node in a JSON (set_json) mutation
+    """
+    subject, passed = _parse_subject(uid)
+    if staged is None:
+        staged = Node._get_staged()
+
+    obj = {
+        "uid": _json_ref(subject),
+        node.__class__.__name__: True,
+        "_type": node.__class__.__name__,
+    }
+    node._serialize_json(node.edges.items(), staged, obj)
+    return obj
+
+
+def generate_json_mutation() -> List[Dict[str, Any]]:
+    """
+    Retrieve staged instances and generate the objects of a JSON (set_json)
+    mutation. Like generate_mutation, staged instances are then cleared.
+    """
+    staged = Node._get_staged()
+    objs = [_node_json(uid, node, staged) for uid, node in staged.items()]
+    Node._clear_staged()
+    return objs
 
 
-def hydrate(data: str, types: List[Node] = None) -> Dict[str, List[Node]]:
+def hydrate(
+    data: Union[Dict[str, Any], bytes, str],
+    types: List[Node] = None,
+    identity_map: Dict[int, Node] = None,
+    codec: str = None,
+) -> Dict[str, List[Node]]:
     """
     Given data retrieved from dgraph, return Python Node instances
+
+    Each uid is hydrated into exactly one instance per identity map. Unless
+    one is passed in (to share it between calls), the identity map of the
+    current session is used. Outside of a session, a new map is used for
+    every call.
+
+    :param codec: The JSON codec used to decode data when it is raw JSON
     """
     # if not isinstance(data, dict) or data_set not in data:
     #     raise InvalidData
+    if isinstance(data, (bytes, str)):
+        data = _codec.loads(data, codec=codec)
     types = {x.__name__: x for x in types} if types else None
 
     output = {}
     # data = data.get(data_set)
-    registered = {x.__name__: x for x in Node._nodes}
+    registered = Node._get_registered()
+    if identity_map is None:
+        identity_map = current_session().identity_map
+        if identity_map is None:
+            identity_map = {}
 
     for func_name, raw_data in data.items():
         hydrated = []
         for raw in raw_data:
             if "_type" in raw and raw.get("_type") in registered:
                 cls = registered.get(raw.get("_type"))
-                hydrated.append(cls._hydrate(raw, types=types))
+                hydrated.append(
+                    cls._hydrate(raw, types=types, identity_map=identity_map)
+                )
 
         output[func_name] = hydrated
 
     return output
 
 
+def hydrate_stream(
+    data: Union[bytes, str, IO, Iterable[bytes]],
+    types: List[Node] = None,
+    identity_map: Dict[int, Node] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[str, Node]]:
+    """
+    Given the raw JSON retrieved from dgraph, incrementally parse it and
+    yield a (block name, Node instance) pair for every top-level item.
+
+    Unless an identity map is passed in, or the current session has one, each
+    item is hydrated with its own map, so nothing is kept alive once the
+    caller is done with an item.
+    """
+    types = {x.__name__: x for x in types} if types else None
+    registered = Node._get_registered()
+
+    for func_name, raw in iter_blocks(data, chunk_size=chunk_size):
+        if isinstance(raw, dict) and raw.get("_type") in registered:
+            cls = registered.get(raw.get("_type"))
+            yield func_name, cls._hydrate(
+                raw, types=types, identity_map=identity_map
+            )
+
+
+def query_iter(
+    qry: str, client: PyDiggyClient = None, *args, **kwargs
+) -> Iterator[Tuple[str, Node]]:
+    """
+    Perform a pydgraph query and lazily yield (block name, Node instance)
+    pairs as the response is parsed. See hydrate_stream.
+    """
+    if client is None:
+        client = get_client(**kwargs)
+        if "host" in kwargs:
+            kwargs.pop("host")
+        if "port" in kwargs:
+            kwargs.pop("port")
+    raw_data = client.query(qry, *args, **kwargs)
+    yield from hydrate_stream(raw_data.json)
+
+
 def query(
     qry: str,
     client: PyDiggyClient = None,
     raw: bool = False,
     json: bool = False,
     *args,
+    codec: str = None,
+    columnar: bool = False,
+    cache: Union[QueryCache, bool] = None,
     **kwargs,
 ) -> Dict[str, Any]:
     """
@@ -160,7 +436,20 @@ def query(
 
     :param raw: Should the raw return of the query be returned
     :param json: Should the raw python objects of the query be returned
+    :param codec: The JSON codec used to decode the response
+    :param columnar: Return columns per node type (see hydrate_columns)
+        instead of Node objects
+    :param cache: The QueryCache to use, instead of the default one (see
+        set_query_cache). False skips caching.
     """
+    cache = _cache._resolve(cache)
+    if cache is not None:
+        key = cache.key(qry, args[0] if args else kwargs.get("variables"))
+        hit = cache.get(key)
+        if hit is not None:
+            return _query_output(*hit, raw, json, columnar, cached=True)
+        generation = cache.generation
+
     if client is None:
         client = get_client(**kwargs)
         if "host" in kwargs:
@@ -168,43 +457,517 @@ def query(
         if "port" in kwargs:
             kwargs.pop("port")
     raw_data = client.query(qry, *args, **kwargs)
-    json_data = _json.loads(raw_data.json)
-    output = hydrate(json_data)
+    json_data = _codec.loads(raw_data.json, codec=codec)
+
+    if cache is not None:
+        cache.put(
+            key,
+            (raw_data, json_data),
+            query_predicates(qry),
+            generation=generation,
+            size=len(raw_data.json),
+        )
+    return _query_output(raw_data, json_data, raw, json, columnar)
+
+
+def _query_output(
+    raw_data: Any,
+    json_data: Dict[str, Any],
+    raw: bool,
+    json: bool,
+    columnar: bool,
+    cached: bool = False,
+) -> Dict[str, Any]:
+    """
+    Hydrate the decoded response of a query (see query). A cached response
+    is shared by every hit, so each caller gets its own copy of the json.
+    """
+    if columnar:
+        output = hydrate_columns(json_data)
+    else:
+        output = hydrate(json_data)
 
     if raw:
         output["raw"] = raw_data
 
     if json:
-        output["json"] = json_data
+        output["json"] = deepcopy(json_data) if cached else json_data
 
     return output
 
 
-def run_mutation(mutation: str, client=None, *args, **kwargs):
-    # TODO:
-    # - Should come up with some sort of way to split mutations and run them
-    #   consexutively instead of all at once. The following is the general idea,
-    #   but it will fail because not all references will be properly defined
-    #   from one mutation to the next
-    # MAX = 1_000
-    # mutations = mutation.split("\n")
-    # mutations = [mutations[i:i + MAX] for i in range(0, len(mutations), MAX)]
-    # o = []
-    # if client is None:
-    #     client = get_client()
-    # for m in mutations:
-    #     transaction = client.txn()
-    #     try:
-    #         print(f'Running {len(m)}')
-    #         o.append(transaction.mutate(set_nquads="\n".join(m)))
-    #         transaction.commit()
-    #     finally:
-    #         transaction.discard()
-    transaction = client.txn()
+BatchReport = namedtuple(
+    "BatchReport", ("index", "lines", "seconds", "rate", "uids")
+)
+MutationResult = namedtuple("MutationResult", ("uids", "batches"))
+
+# The subject, predicate and (when it is a blank node) object of an N-Quad
+_NQUAD = re.compile(r"(\S+) (<[^>]*>) (_:\S+)?")
+
+# The subject, predicate and (when it is a node) object of an N-Quad
+_NODE_EDGE = re.compile(r"(\S+) (<[^>]*>) (_:\S+|<0x[0-9a-fA-F]+>)?")
+
+
+def _blank_nodes(line: str) -> Tuple[str, Union[str, None]]:
+    match = _NQUAD.match(line)
+    if match is None:
+        return line.split(" ", 1)[0], None
+    return match.group(1), match.group(3)
+
+
+def _resolve(line: str, resolved: Dict[str, str]) -> str:
+    """
+    Rewrite the blank nodes of a line that were committed in earlier batches
+    """
+    subject, obj = _blank_nodes(line)
+    if obj in resolved:
+        predicate_end = line.index(obj, len(subject))
+        line = (
+            line[:predicate_end]
+            + resolved[obj]
+            + line[predicate_end + len(obj) :]
+        )
+    if subject in resolved:
+        line = resolved[subject] + line[len(subject) :]
+    return line
+
+
+def _iter_batches(
+    lines: List[str], batch_size: int, resolved: Dict[str, str]
+) -> Iterator[List[str]]:
+    """
+    Group the lines of a mutation by subject, and yield batches of whole
+    subjects of about batch_size lines.
+
+    An edge to a blank node that is neither committed yet nor defined in the
+    same batch would create a second node for that label, so such lines are
+    held back and sent once every subject has been committed. Lines are
+    rewritten with the uids in resolved (filled in by the caller after each
+    commit) right before they are yielded.
+    """
+    subjects: Dict[str, List[str]] = {}
+    for line in lines:
+        if line.strip():
+            subjects.setdefault(_blank_nodes(line)[0], []).append(line)
+
+    deferred = []
+    batch = []
+    defined = set()
+
+    def flush():
+        nonlocal batch
+        ready = []
+        for line in batch:
+            _, obj = _blank_nodes(line)
+            if obj is None or obj in resolved or obj in defined:
+                ready.append(_resolve(line, resolved))
+            else:
+                deferred.append(line)
+        batch = []
+        defined.clear()
+        return ready
+
+    for subject, subject_lines in subjects.items():
+        if batch and len(batch) + len(subject_lines) > batch_size:
+            ready = flush()
+            if ready:
+                yield ready
+        batch.extend(subject_lines)
+        defined.add(subject)
+
+    ready = flush()
+    if ready:
+        yield ready
+
+    # Whatever is left only references nodes that now have a uid, or blank
+    # nodes that are never defined as a subject
+    while deferred:
+        batch, deferred = deferred[:batch_size], deferred[batch_size:]
+        yield [_resolve(line, resolved) for line in batch]
+
+
+def _components(lines: List[str]) -> List[List[str]]:
+    """
+    Partition the lines of a mutation into connected components. Two
+    subjects are connected when an edge between them (by blank node or by
+    uid) appears in the mutation.
+    """
+    parents: Dict[str, str] = {}
+
+    def find(x):
+        parents.setdefault(x, x)
+        while parents[x] != x:
+            parents[x] = parents[parents[x]]
+            x = parents[x]
+        return x
+
+    keyed = []
+    for line in lines:
+        if not line.strip():
+            continue
+        match = _NODE_EDGE.match(line)
+        subject = match.group(1) if match else line.split(" ", 1)[0]
+        root = find(subject)
+        if match and match.group(3):
+            other = find(match.group(3))
+            if other != root:
+                parents[other] = root
+        keyed.append((subject, line))
+
+    components: Dict[str, List[str]] = {}
+    for subject, line in keyed:
+        components.setdefault(find(subject), []).append(line)
+    return list(components.values())
+
+
+def _pack(components: List[List[str]], size: int) -> List[List[str]]:
+    """
+    Combine whole components into groups of about size lines
+    """
+    groups = []
+    group = []
+    for component in components:
+        if group and len(group) + len(component) > size:
+            groups.append(group)
+            group = []
+        group.extend(component)
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _commit_batches(
+    lines: List[str],
+    client: PyDiggyClient,
+    batch_size: int,
+    report: Callable[[int, float, Dict[str, str]], BatchReport],
+) -> Tuple[Dict[str, str], List[BatchReport]]:
+    resolved: Dict[str, str] = {}
+    uids: Dict[str, str] = {}
+    reports = []
+
+    for batch in _iter_batches(lines, batch_size, resolved):
+        start = perf_counter()
+        transaction = client.txn()
+        try:
+            o = transaction.mutate(set_nquads="\n".join(batch))
+            transaction.commit()
+        finally:
+            transaction.discard()
+        seconds = perf_counter() - start
+
+        assigned = dict(getattr(o, "uids", None) or {})
+        for label, uid in assigned.items():
+            resolved[f"_:{label}"] = f"<{uid}>"
+        uids.update(assigned)
+        reports.append(report(len(batch), seconds, assigned))
+
+    return uids, reports
+
+
+def run_mutation(
+    mutation: Union[str, List[Dict[str, Any]]],
+    client: Union[PyDiggyClient, List[PyDiggyClient]] = None,
+    *args,
+    batch_size: int = None,
+    on_batch: Callable[[BatchReport], None] = None,
+    workers: int = None,
+    codec: str = None,
+    **kwargs,
+):
+    """
+    Run a set mutation. It is either N-Quads, or the objects of a JSON
+    mutation (see generate_json_mutation), encoded with codec.
+
+    Without a batch_size, the whole mutation is run in a single transaction
+    and the pydgraph response is returned.
+
+    With a batch_size, the lines are grouped by subject and committed in
+    transactions of about batch_size lines. Blank nodes (_:unsaved.N) that
+    were committed in one batch are rewritten to their uid in later ones, so
+    every label still ends up as exactly one node. A MutationResult of all
+    the assigned uids and a BatchReport per batch is returned.
+
+    With workers, the mutation is partitioned into connected components,
+    which are committed concurrently over a pool of that many threads. When
+    client is a list of clients (one per Dgraph alpha, for instance), the
+    groups of components are spread over them. Without a batch_size, the
+    components are split evenly between the workers.
+
+    :param on_batch: Called with the BatchReport of each committed batch.
+        With workers, it is called from the worker threads.
+    """
     try:
-        o = transaction.mutate(set_nquads=mutation)
-        transaction.commit()
+        return _run_mutation(
+            mutation,
+            client,
+            *args,
+            batch_size=batch_size,
+            on_batch=on_batch,
+            workers=workers,
+            codec=codec,
+            **kwargs,
+        )
     finally:
-        transaction.discard()
-    # else:
-    return o
+        # Even a failed run may have committed some of its batches
+        _cache.invalidate(mutation)
+
+
+def _run_mutation(
+    mutation, client, *args, batch_size, on_batch, workers, codec, **kwargs
+):
+    if client is None:
+        client = get_client(**kwargs)
+        kwargs.pop("host", None)
+        kwargs.pop("port", None)
+
+    if not isinstance(mutation, str):
+        if batch_size is not None or workers is not None:
+            raise ValueError("Only N-Quad mutations can be run in batches.")
+        transaction = client.txn()
+        try:
+            o = transaction.mutate(
+                mutation=json_mutation(mutation, codec=codec)
+            )
+            transaction.commit()
+        finally:
+            transaction.discard()
+        return o
+
+    if batch_size is None and workers is None:
+        transaction = client.txn()
+        try:
+            o = transaction.mutate(set_nquads=mutation)
+            transaction.commit()
+        finally:
+            transaction.discard()
+        return o
+
+    clients = client if isinstance(client, (list, tuple)) else [client]
+    lines = mutation.split("\n")
+    counter = _count()
+    lock = Lock()
+
+    def report(size, seconds, assigned):
+        with lock:
+            index = next(counter)
+        batch = BatchReport(
+            index,
+            size,
+            seconds,
+            size / seconds if seconds else float("inf"),
+            len(assigned),
+        )
+        if on_batch is not None:
+            on_batch(batch)
+        return batch
+
+    if workers is None:
+        uids, reports = _commit_batches(lines, clients[0], batch_size, report)
+        return MutationResult(uids, reports)
+
+    components = _components(lines)
+    total = sum(len(x) for x in components)
+    size = batch_size or max(1, -(-total // workers))
+    groups = _pack(components, size)
+
+    uids = {}
+    reports = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _commit_batches,
+                group,
+                clients[i % len(clients)],
+                batch_size or len(group),
+                report,
+            )
+            for i, group in enumerate(groups)
+        ]
+        for future in futures:
+            group_uids, group_reports = future.result()
+            uids.update(group_uids)
+            reports.extend(group_reports)
+
+    reports.sort(key=lambda x: x.index)
+    return MutationResult(uids, reports)
+
+
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+
+
+def _query_value(value: Any) -> str:
+    """
+    Encode a value as a literal of a DQL query function
+    """
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, bool):
+        return str(value).lower()
+    elif isinstance(value, (int, float)):
+        return str(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return _codec.dumps(str(value), codec="json")
+
+
+def _upsert_filter(node: Node, keys: Tuple[str, ...]) -> str:
+    conditions = []
+    for key in keys:
+        value = getattr(node, key, None)
+        if value is None:
+            raise MissingAttribute(node, key)
+        conditions.append(f"eq({key}, {_query_value(value)})")
+
+    func, conditions = conditions[0], conditions[1:]
+    conditions.append(f"has({node.__class__.__name__})")
+    return f"(func: {func}) @filter({' AND '.join(conditions)})"
+
+
+def bulk_upsert(
+    nodes: Iterable[Node],
+    client: PyDiggyClient = None,
+    key: Iterable[str] = None,
+    batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+    on_batch: Callable[[BatchReport], None] = None,
+    **kwargs,
+) -> MutationResult:
+    """
+    Create or update many nodes, matching them to those already stored by
+    their @upsert predicates (or else their exact indexed predicates). Every
+    batch of batch_size nodes is a single upsert block: one query that
+    looks all of them up, and a mutation that writes all of their values.
+
+    Nodes being upserted together may reference each other without being
+    staged. Once committed, fresh nodes are given the uid of the node they
+    matched or created, and a MutationResult of those uids and a
+    BatchReport per batch is returned.
+
+    :param key: The predicates to match on, instead of those of each class
+    """
+    if client is None:
+        client = get_client(**kwargs)
+
+    nodes = list(nodes)
+    staged = dict(Node._get_staged())
+    staged.update((node.uid, node) for node in nodes)
+    key = tuple(key) if key else None
+
+    resolved: Dict[str, str] = {}
+    uids: Dict[str, str] = {}
+    reports = []
+    deferred = []
+    count = 0
+
+    for offset in range(0, len(nodes), batch_size):
+        batch = nodes[offset : offset + batch_size]
+        blocks = {}
+        variables = {}
+        subjects = []
+
+        for node in batch:
+            subject, passed = _parse_subject(node.uid)
+            if isinstance(passed, int):
+                subjects.append((node, subject, None))
+                continue
+
+            keys = key or node._get_upsert_keys()
+            if not keys:
+                raise ValueError(
+                    f"{node.__class__.__name__} has no @upsert or exact "
+                    "indexed predicate to upsert on."
+                )
+
+            # Nodes with the same key share a variable, so that they are
+            # created only once. Variables are numbered across batches.
+            block = _upsert_filter(node, keys)
+            if block not in blocks:
+                blocks[block] = f"v{count}"
+                count += 1
+            var = blocks[block]
+            variables[subject] = f"uid({var})"
+            subjects.append((node, subject, var))
+
+        lines = []
+        for node, subject, _ in subjects:
+            values = [
+                (pred, value)
+                for pred, value in node._get_values()
+                if pred in node._get_predicates()
+                and pred != "uid"
+                and value is not None
+            ]
+            node_lines = [
+                f'{subject} <{node.__class__.__name__}> "true" .',
+                f'{subject} <_type> "{node.__class__.__name__}" .',
+            ]
+            node._serialize(subject, values, staged, node_lines)
+
+            # Lines keep their blank nodes until they are sent, so that
+            # the edges held back are rewritten with uids in the end
+            for line in node_lines:
+                _, obj = _blank_nodes(line)
+                if obj is None or obj in variables or obj in resolved:
+                    lines.append(_resolve(line, {**resolved, **variables}))
+                else:
+                    deferred.append(line)
+
+        query = "\n".join(
+            f"  {var} as q{var[1:]}{block} {{ uid }}"
+            for block, var in blocks.items()
+        )
+        query = f"{{\n{query}\n}}"
+
+        start = perf_counter()
+        transaction = client.txn()
+        try:
+            request = transaction.create_request(
+                query=query,
+                mutations=[
+                    pydgraph.Mutation(
+                        set_nquads="\n".join(lines).encode("utf-8")
+                    )
+                ],
+                commit_now=True,
+            )
+            o = transaction.do_request(request)
+        finally:
+            transaction.discard()
+            _cache.invalidate("\n".join(lines))
+        seconds = perf_counter() - start
+
+        found = _codec.loads(o.json) if o.json else {}
+        created = dict(getattr(o, "uids", None) or {})
+        assigned = {}
+        for node, subject, var in subjects:
+            if var is None:
+                node._mark_saved(assigned)
+                continue
+            matches = found.get(f"q{var[1:]}") or ()
+            uid = matches[0]["uid"] if matches else created.get(f"uid({var})")
+            if uid is None:
+                continue
+            assigned[str(node.uid)] = uid
+            resolved[f"_:{node.uid}"] = f"<{uid}>"
+            node._mark_saved(assigned)
+        uids.update(assigned)
+
+        report = BatchReport(
+            len(reports),
+            len(lines),
+            seconds,
+            len(lines) / seconds if seconds else float("inf"),
+            len(created),
+        )
+        reports.append(report)
+        if on_batch is not None:
+            on_batch(report)
+
+    # Edges to nodes of later batches, which all have a uid by now
+    if deferred:
+        run_mutation(
+            "\n".join(_resolve(line, resolved) for line in deferred),
+            client=client,
+        )
+
+    return MutationResult(uids, reports)
@@ -0,0 +1,126 @@
+"""
+Registries of the node instances created for each Node class, by uid.
+
+The kind of registry is set for all Node classes with
+Node.configure_registry(), or with the PYDIGGY_INSTANCE_REGISTRY and
+PYDIGGY_INSTANCE_REGISTRY_SIZE environment variables:
+
+    - weak: instances are kept only as long as something else references
+      them (the default)
+    - lru: strong references to at most maxsize instances
+    - strong: strong references to every instance, until Node._reset()
+    - disabled: nothing is kept
+
+A registry is shared by every thread and session, and locks its lookups.
+"""
+
+from collections import OrderedDict, namedtuple
+from collections.abc import MutableMapping
+from os import environ
+from threading import RLock
+from typing import Any, Iterator
+from weakref import WeakValueDictionary
+
+REGISTRY_MODES = ("weak", "lru", "strong", "disabled")
+
+DEFAULT_REGISTRY_MODE = environ.get("PYDIGGY_INSTANCE_REGISTRY", "weak")
+DEFAULT_REGISTRY_SIZE = int(environ.get("PYDIGGY_INSTANCE_REGISTRY_SIZE", 0))
+
+RegistryStats = namedtuple(
+    "RegistryStats", ("mode", "size", "maxsize", "hits", "misses", "evictions")
+)
+
+
+class InstanceRegistry(MutableMapping):
+    def __init__(self, mode: str = None, maxsize: int = None) -> None:
+        mode = DEFAULT_REGISTRY_MODE if mode is None else mode
+        maxsize = DEFAULT_REGISTRY_SIZE if maxsize is None else maxsize
+        if mode not in REGISTRY_MODES:
+            raise ValueError(
+                f"Unknown registry mode: {mode}. "
+                f"Expected one of: {', '.join(REGISTRY_MODES)}"
+            )
+        if mode == "lru" and not maxsize:
+            raise ValueError("An lru registry needs a maxsize.")
+
+        self.mode = mode
+        self.maxsize = maxsize if mode == "lru" else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = RLock()
+
+        if mode == "weak":
+            self._data = WeakValueDictionary()
+        elif mode == "lru":
+            self._data = OrderedDict()
+        else:
+            self._data = {}
+
+    def __repr__(self):
+        return f"<InstanceRegistry {self.mode} {len(self)}>"
+
+    def __getitem__(self, uid: Any) -> Any:
+        with self._lock:
+            try:
+                instance = self._data[uid]
+            except KeyError:
+                self.misses += 1
+                raise
+            self.hits += 1
+            if self.maxsize:
+                self._data.move_to_end(uid)
+            return instance
+
+    def __setitem__(self, uid: Any, instance: Any) -> None:
+        if self.mode == "disabled":
+            return
+
+        with self._lock:
+            self._data[uid] = instance
+            if self.maxsize:
+                self._data.move_to_end(uid)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+
+    def __contains__(self, uid: Any) -> bool:
+        return uid in self._data
+
+    def record(self, reused: bool) -> None:
+        """
+        Count the lookup of a uid that is being hydrated: a hit when an
+        existing instance is reused for it, a miss when one is created
+        """
+        with self._lock:
+            if reused:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def __delitem__(self, uid: Any) -> None:
+        with self._lock:
+            del self._data[uid]
+
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def values(self):
+        # Materialized first, because weak values may vanish while iterating
+        with self._lock:
+            return list(self._data.values())
+
+    def stats(self) -> RegistryStats:
+        with self._lock:
+            return RegistryStats(
+                self.mode,
+                len(self),
+                self.maxsize,
+                self.hits,
+                self.misses,
+                self.evictions,
+            )
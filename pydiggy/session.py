@@ -0,0 +1,102 @@
+"""
+Sessions (units of work) that own staged nodes, the counter used to label
+unsaved nodes, and optionally an identity map for hydration.
+
+The current session is tracked with a context variable, so every thread and
+every asyncio task can work in its own session:
+
+    with Session() as session:
+        por = Region(name="Portugal")
+        por.stage()
+        mutation = generate_mutation()
+
+Outside of any session, a process wide default session is used. It has no
+identity map, so hydration falls back to one identity map per call.
+
+The registries of node instances are shared by every session, so the labels
+of unsaved nodes are unique across sessions: unsaved.N in the default
+session, and unsaved.sI.N in the session numbered I.
+"""
+
+from contextvars import ContextVar
+from itertools import count as _count
+from threading import RLock
+from typing import Any, Dict, Optional
+
+_ids = _count(1)
+
+
+class Session:
+    def __init__(self, identity_map: bool = True, prefix: str = None) -> None:
+        self.staged: Dict[Any, Any] = {}
+        self.identity_map: Optional[Dict[int, Any]] = (
+            {} if identity_map else None
+        )
+        self.prefix = f"unsaved.s{next(_ids)}" if prefix is None else prefix
+        self._counter = _count()
+        self._lock = RLock()
+        self._tokens = []
+
+    def __repr__(self):
+        return f"<Session staged={len(self.staged)}>"
+
+    def __enter__(self) -> "Session":
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *args) -> None:
+        _current.reset(self._tokens.pop())
+
+    def next_uid(self) -> str:
+        """
+        Generate a label for a node that has not been saved yet
+        """
+        with self._lock:
+            i = next(self._counter)
+        return f"{self.prefix}.{i}"
+
+    def stage(self, node: Any) -> None:
+        with self._lock:
+            self.staged[node.uid] = node
+
+    def clear(self) -> None:
+        """
+        Drop all staged nodes, and restart the labels of unsaved nodes
+        """
+        with self._lock:
+            self.staged = {}
+            self._counter = _count()
+
+    def flush(self, **kwargs) -> Any:
+        """
+        Save every staged node in a single transaction, and drop them from
+        the session. Keyword arguments are passed on to Node.save_all.
+        """
+        from pydiggy.node import Node
+
+        with self._lock:
+            staged = list(self.staged.items())
+        o = Node.save_all([node for _, node in staged], **kwargs)
+        with self._lock:
+            for uid, node in staged:
+                if self.staged.get(uid) is node:
+                    del self.staged[uid]
+        return o
+
+    def reset_counter(self) -> None:
+        with self._lock:
+            self._counter = _count()
+
+
+_default = Session(identity_map=False, prefix="unsaved")
+_current: ContextVar[Optional[Session]] = ContextVar(
+    "pydiggy_session", default=None
+)
+
+
+def current_session() -> Session:
+    """
+    The session of the current context, or the default session
+    """
+    session = _current.get()
+    return _default if session is None else session
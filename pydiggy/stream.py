@@ -0,0 +1,155 @@
+"""
+Incremental parsing of Dgraph query responses.
+
+A response is a JSON object that maps block names to lists of objects. Rather
+than decoding the whole document at once, the items of each block are decoded
+and yielded one at a time, so that only the item currently being handled
+(plus a read buffer) needs to be held in memory.
+"""
+
+import codecs
+from json import JSONDecodeError, JSONDecoder
+from typing import IO, Any, Dict, Iterable, Iterator, Tuple, Union
+
+from pydiggy.exceptions import InvalidData
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+def _chunks(source, chunk_size):
+    if isinstance(source, (bytes, bytearray, memoryview, str)):
+        for i in range(0, len(source), chunk_size):
+            yield source[i : i + chunk_size]
+    elif hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield from source
+
+
+class _Reader:
+    def __init__(self, source, chunk_size):
+        self.chunks = _chunks(source, chunk_size)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk into the buffer. Returns False at the end of input
+        """
+        if self.eof:
+            return False
+
+        if self.pos:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buffer += self.decoder.decode(b"", final=True)
+            return False
+
+        if isinstance(chunk, str):
+            self.buffer += chunk
+        else:
+            self.buffer += self.decoder.decode(bytes(chunk))
+        return True
+
+    def peek(self) -> str:
+        """
+        Return the next non whitespace character, without consuming it
+        """
+        while True:
+            while self.pos < len(self.buffer):
+                char = self.buffer[self.pos]
+                if char not in _WHITESPACE:
+                    return char
+                self.pos += 1
+            if not self.fill():
+                return ""
+
+    def expect(self, *chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise InvalidData(
+                f"Expected {' or '.join(chars)} at {self.pos}, found {char!r}."
+            )
+        self.pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """
+        Decode the next JSON value, reading more input until it is complete
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except JSONDecodeError:
+                value, end = None, None
+
+            # A value that runs to the very end of the buffer may have been
+            # cut short (a number, for example), so it is only accepted once
+            # something follows it or there is nothing left to read.
+            if end is not None and (end < len(self.buffer) or self.eof):
+                self.pos = end
+                return value
+
+            # Read at least as much again as is already buffered, so that a
+            # large value is decoded a bounded number of times.
+            size = len(self.buffer) - self.pos
+            target = max(size * 2, size + 1)
+            while len(self.buffer) - self.pos < target:
+                if not self.fill():
+                    break
+
+            remaining = len(self.buffer) - self.pos
+            if self.eof and end is None and size == remaining:
+                raise InvalidData("Unexpected end of response.")
+
+
+def iter_blocks(
+    source: Union[bytes, str, IO, Iterable[bytes]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Given the raw JSON of a Dgraph response, yield (block name, item) pairs
+    for every item in every block.
+
+    The source can be bytes, a string, a file-like object, or any iterable of
+    byte chunks. Top level values that are not lists are skipped.
+    """
+    reader = _Reader(source, chunk_size)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        name = reader.decode()
+        reader.expect(":")
+
+        if reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield name, reader.decode()
+                    if reader.expect(",", "]") == "]":
+                        break
+        else:
+            reader.decode()
+
+        if reader.expect(",", "}") == "}":
+            break
@@ -1,4 +1,12 @@
 def _parse_subject(uid):
+    if isinstance(uid, str) and uid[:2] in ("0x", "0X"):
+        # uids given as strings ("0x11") are the same node as the int. Any
+        # other string, even "42", is the label of a blank node.
+        try:
+            uid = int(uid, 16)
+        except ValueError:
+            return f"_:{uid}", uid
+
     if isinstance(uid, int):
         return f"<{hex(uid)}>", uid
     else:
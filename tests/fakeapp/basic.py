@@ -12,6 +12,16 @@ class Region(Node):
     borders: List[Region]
 
 
+def regions():
+    previous = None
+    for i in range(5):
+        region = Region(name=f"Region {i}")
+        if previous is not None:
+            region.borders = [previous]
+        yield region
+        previous = region
+
+
 if __name__ == "__main__":
     por = Region(uid=0x11, name="Portugal")
     spa = Region(uid=0x12, name="Spain")
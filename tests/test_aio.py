@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+from pydiggy import aio, aquery, arun_mutation, atransaction
+
+
+class FakeResponse:
+    def __init__(self, json=b"{}", uids=None):
+        self.json = json
+        self.uids = uids or {}
+
+
+class FakeTransaction:
+    def __init__(self, client):
+        self.client = client
+
+    def query(self, query, *args, **kwargs):
+        self.client.queries.append(query)
+        return FakeResponse(json.dumps(self.client.data).encode())
+
+    def mutate(self, set_nquads=None, del_nquads=None, mutation=None):
+        self.client.mutations.append(set_nquads or mutation)
+        labels = {
+            line.split(" ")[0][2:]
+            for line in (set_nquads or "").split("\n")
+            if line.startswith("_:")
+        }
+        return FakeResponse(
+            uids={label: hex(0x100 + i) for i, label in enumerate(labels)}
+        )
+
+    def commit(self):
+        self.client.commits += 1
+
+    def discard(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, data=None):
+        self.data = data or {}
+        self.queries = []
+        self.mutations = []
+        self.commits = 0
+
+    def txn(self, read_only=False):
+        return FakeTransaction(self)
+
+
+class FakeAsyncTransaction(FakeTransaction):
+    async def query(self, *args, **kwargs):
+        client = self.client
+        client.in_flight += 1
+        client.peak = max(client.peak, client.in_flight)
+        await asyncio.sleep(0.001)
+        client.in_flight -= 1
+        return super().query(*args, **kwargs)
+
+    async def mutate(self, *args, **kwargs):
+        return super().mutate(*args, **kwargs)
+
+    async def commit(self):
+        super().commit()
+
+    async def discard(self):
+        pass
+
+
+class FakeAsyncClient(FakeClient):
+    in_flight = 0
+    peak = 0
+
+    def txn(self, read_only=False):
+        return FakeAsyncTransaction(self)
+
+
+def test_aquery(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    data = {"q": [{"uid": "0x11", "_type": "Region", "name": "Portugal"}]}
+
+    for client in (FakeClient(data), FakeAsyncClient(data)):
+        result = asyncio.run(aquery("{ q(func: has(name)) { uid } }", client))
+        assert result["q"][0].name == "Portugal"
+        assert result["q"][0].uid == 0x11
+        assert client.queries == ["{ q(func: has(name)) { uid } }"]
+
+
+def test_arun_mutation_and_asave(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    client = FakeClient()
+    asyncio.run(arun_mutation('<0x11> <name> "Portugal" .', client))
+    assert client.mutations == ['<0x11> <name> "Portugal" .']
+    assert client.commits == 1
+
+    por = Region(name="Portugal")
+    asyncio.run(por.asave(client=client))
+    assert por.uid == 0x100
+    assert client.commits == 2
+
+    async def transaction():
+        async with atransaction(FakeAsyncClient()) as txn:
+            assert txn.native
+            await txn.mutate(set_nquads='<0x100> <name> "Spain" .')
+            await txn.commit()
+            return txn._txn.client
+
+    assert asyncio.run(transaction()).commits == 1
+
+
+def test_aquery_concurrency():
+    client = FakeAsyncClient({"q": []})
+
+    async def run():
+        await asyncio.gather(*(aquery("{}", client) for _ in range(20)))
+
+    aio.set_concurrency(4)
+    try:
+        asyncio.run(run())
+    finally:
+        aio.set_concurrency(aio.DEFAULT_ASYNC_CONCURRENCY)
+    assert len(client.queries) == 20
+    assert client.peak == 4
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pydiggy import QueryBatcher
+from pydiggy.batching import merge_queries
+
+BY_NAME = """query regions($name: string = "Portugal") {
+    regions(func: eq(name, $name)) @filter(has(area)) {
+        uid
+        _type
+        name
+    }
+}"""
+
+NEIGHBOURS = """{
+    # Every region that borders another
+    var(func: has(borders)) {
+        b as borders
+    }
+    regions(func: uid(b), orderasc: name) {
+        uid
+        _type
+        name
+    }
+}"""
+
+
+BORDERING = """{
+    b as var(func: has(borders))
+    regions(func: uid(b)) { uid }
+}"""
+
+BAD = "{ bad(func: has(name)) { uid } }"
+
+
+class FakeResponse:
+    def __init__(self, json):
+        self.json = json
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = []
+
+    def query(self, qry, variables=None):
+        self.requests.append((qry, variables))
+        if "bad(" in qry:
+            raise ValueError("Bad query")
+        blocks = re.findall(r"^\s*(\w+)\(func", qry, re.MULTILINE)
+        data = {
+            block: [{"uid": "0x11", "_type": "Region", "name": block}]
+            for block in blocks
+            if block != "var"
+        }
+        return FakeResponse(json.dumps(data).encode())
+
+    def txn(self, read_only=False):
+        return self
+
+    def discard(self):
+        pass
+
+
+def test_merge_queries():
+    merged, variables, renames = merge_queries(
+        [(BY_NAME, {"$name": "Spain"}), (NEIGHBOURS, None)]
+    )
+    assert merged.startswith("query batch($q0_name: string = ")
+    assert "q0_regions(func: eq(name, $q0_name)) @filter(has(area))" in merged
+    assert "q1_b as borders" in merged
+    assert "q1_regions(func: uid(q1_b), orderasc: name)" in merged
+    assert "var(func: has(borders))" in merged
+    assert variables == {"$q0_name": "Spain"}
+    assert renames == [{"q0_regions": "regions"}, {"q1_regions": "regions"}]
+
+    merged, _, renames = merge_queries([(BORDERING, None)] * 2)
+    assert "q1_b as var(func: has(borders))" in merged
+    assert "q1_regions(func: uid(q1_b)) { uid }" in merged
+    assert renames[1] == {"q1_regions": "regions"}
+
+
+def test_query_batcher(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    client = FakeClient()
+    batcher = QueryBatcher(client, window=0.05)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(
+            executor.map(batcher.query, [BY_NAME, NEIGHBOURS, NEIGHBOURS])
+        )
+
+    assert len(client.requests) == 1
+    assert (batcher.requests, batcher.queries) == (1, 3)
+    assert [x["regions"][0].name for x in results] == [
+        "q0_regions",
+        "q1_regions",
+        "q2_regions",
+    ]
+
+
+def test_query_batcher_max_batch():
+    client = FakeClient()
+    batcher = QueryBatcher(client, window=10, max_batch=2)
+
+    first = batcher.submit(NEIGHBOURS)
+    second = batcher.submit(BY_NAME, {"$name": "Spain"})
+    assert list(first.result(timeout=1)) == ["regions"]
+    assert list(second.result(timeout=1)) == ["regions"]
+    assert client.requests[0][1] == {"$q1_name": "Spain"}
+
+    # A query that cannot be merged is sent on its own
+    third = batcher.submit("fragment f { uid }")
+    fourth = batcher.submit(NEIGHBOURS)
+    assert fourth.result(timeout=1)["regions"][0]["name"] == "regions"
+    assert third.result(timeout=1) == {}
+    assert [x[0] for x in client.requests[-2:]] == [
+        "fragment f { uid }",
+        NEIGHBOURS,
+    ]
+
+
+def test_query_batcher_failure():
+    client = FakeClient()
+    batcher = QueryBatcher(client, window=10, max_batch=4)
+
+    futures = [
+        batcher.submit(qry) for qry in (NEIGHBOURS, NEIGHBOURS, BAD, BY_NAME)
+    ]
+    with pytest.raises(ValueError):
+        futures[2].result(timeout=1)
+    assert [list(x.result(timeout=1)) for x in futures[:2]] == [
+        ["regions"],
+        ["regions"],
+    ]
+    assert futures[3].result(timeout=1)["regions"][0]["name"] == "regions"
+
+    # Only the half of the batch with the bad query is split again
+    assert (batcher.requests, batcher.queries) == (5, 4)
+    assert [x[0] for x in client.requests[-2:]] == [BAD, BY_NAME]
+
+
+def test_query_batcher_async(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    client = FakeClient()
+    batcher = QueryBatcher(client, window=0)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.aquery(NEIGHBOURS) for _ in range(5))
+        )
+
+    results = asyncio.run(run())
+    assert len(client.requests) == 1
+    assert [x["regions"][0].name for x in results] == [
+        f"q{i}_regions" for i in range(5)
+    ]
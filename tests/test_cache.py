@@ -0,0 +1,138 @@
+from time import sleep
+
+from pydiggy import QueryCache, query, run_mutation
+from pydiggy.cache import ALL, mutation_predicates, query_predicates
+from pydiggy.connection import json_mutation
+
+REGIONS = """{
+    regions(func: has(name), orderasc: name) @filter(eq(area, "1")) {
+        uid
+        _type
+        name
+        borders @facets(distance) { uid }
+    }
+}"""
+
+
+class FakeResponse:
+    def __init__(self, json):
+        self.json = json
+
+
+class FakeClient:
+    def __init__(self):
+        self.queries = 0
+
+    def query(self, qry, variables=None):
+        self.queries += 1
+        return FakeResponse(
+            b'{"regions": [{"uid": "0x11", "_type": "Region", '
+            b'"name": "Portugal"}]}'
+        )
+
+    def txn(self):
+        return self
+
+    def mutate(self, **kwargs):
+        return FakeResponse(b"{}")
+
+    def commit(self):
+        pass
+
+    def discard(self):
+        pass
+
+
+def test_query_predicates():
+    assert {"name", "area", "borders", "_type"} <= query_predicates(REGIONS)
+    assert "1" not in query_predicates(REGIONS)
+    assert query_predicates("{ q(func: uid(0x1)) { expand(_all_) } }") == {
+        ALL
+    }
+    assert "~borders" not in query_predicates("{ q { ~borders { uid } } }")
+    assert "borders" in query_predicates("{ q { ~borders { uid } } }")
+
+
+def test_mutation_predicates():
+    nquads = '_:a <name> "x" .\n<0x1> <borders> <0x2> (distance=1.5) .'
+    assert mutation_predicates(nquads) == {"name", "borders"}
+    assert mutation_predicates("<0x1> * * .") == {ALL}
+    assert mutation_predicates(
+        [{"uid": "_:a", "name": "x", "borders": [{"uid": "0x2"}]}]
+    ) == {"name", "borders"}
+    assert mutation_predicates(json_mutation(del_obj=[{"uid": "0x1"}])) == {
+        ALL
+    }
+
+
+def test_query_cache(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    client = FakeClient()
+    cache = QueryCache(maxsize=2)
+
+    first = query(REGIONS, client, cache=cache)
+    second = query(REGIONS, client, cache=cache)
+    assert client.queries == 1
+    assert second["regions"][0].name == "Portugal"
+    assert second["regions"][0] is not first["regions"][0]
+
+    # Each hit gets its own copy of the json
+    third = query(REGIONS, client, json=True, cache=cache)
+    third["json"]["regions"].clear()
+    assert query(REGIONS, client, json=True, cache=cache)["json"]["regions"]
+    assert client.queries == 1
+
+    query(REGIONS, client, cache=False)
+    query(REGIONS, client, variables={"$a": "1"}, cache=cache)
+    assert client.queries == 3
+
+    stats = cache.stats()
+    assert (stats.size, stats.hits, stats.misses) == (2, 3, 2)
+    assert stats.hit_rate == 3 / 5
+
+    query("{ other(func: has(area)) { uid } }", client, cache=cache)
+    assert len(cache) == 2
+    assert cache.stats().evictions == 1
+
+
+def test_query_cache_invalidation(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    client = FakeClient()
+    cache = QueryCache(maxsize=10)
+
+    query(REGIONS, client, cache=cache)
+    query("{ q(func: has(population)) { uid } }", client, cache=cache)
+    assert len(cache) == 2
+
+    run_mutation('<0x11> <population> "10" .', client)
+    assert len(cache) == 1
+
+    query(REGIONS, client, cache=cache)
+    assert client.queries == 2
+
+    por = Region(uid=0x11, name="Portugal")
+    por.name = "Portugal!"
+    por.save(client=client)
+    assert len(cache) == 0
+    assert cache.stats().invalidations == 2
+
+
+def test_query_cache_limits():
+    cache = QueryCache(maxsize=10, ttl=0.01, max_bytes=10)
+    cache.put("a", 1, ["name"], size=4)
+    cache.put("b", 2, ["name"], size=4)
+    cache.put("c", 3, ["name"], size=4)
+    assert list(cache._entries) == ["b", "c"]
+    assert cache.bytes == 8
+
+    # A value that was read before an invalidation is not stored
+    generation = cache.generation
+    cache.invalidate(["area"])
+    cache.put("d", 4, ["name"], generation=generation)
+    assert cache.get("d") is None
+
+    sleep(0.02)
+    assert cache.get("b") is None
+    assert cache.stats().expirations == 1
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from pydiggy import codec, hydrate
+
+
+def test_default_codec():
+    assert codec.get_codec().name == codec.DEFAULT_JSON_CODEC
+    assert codec.loads(b'{"a": [1]}') == {"a": [1]}
+    assert json.loads(codec.dumps({"a": [1]})) == {"a": [1]}
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        codec.get_codec("nope")
+
+
+@pytest.mark.parametrize("name", sorted(codec.CODECS))
+def test_codecs(name):
+    data = {"q": [{"uid": "0x1", "name": "Région", "area": 1.5}]}
+    encoded = codec.dumps(data, codec=name)
+
+    assert isinstance(encoded, str)
+    assert codec.loads(encoded, codec=name) == data
+    assert codec.loads(encoded.encode("utf-8"), codec=name) == data
+
+
+def test_set_codec():
+    original = codec.get_codec()
+    try:
+        assert codec.set_codec("json").name == "json"
+        assert codec.get_codec().name == "json"
+    finally:
+        codec.set_codec(original.name)
+
+
+def test_hydrate_raw_json(RegionClass):
+    raw = b'{"q": [{"uid": "0x11", "_type": "Region", "name": "Portugal"}]}'
+    data = hydrate(raw)
+
+    assert data["q"][0].name == "Portugal"
+    assert json.loads(data["q"][0].dumps()) == {
+        "_type": "Region",
+        "uid": 0x11,
+        "name": "Portugal",
+    }
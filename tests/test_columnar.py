@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from array import array
+from typing import List
+
+import pytest
+
+from pydiggy import Node, hydrate_columns, reverse
+from pydiggy import columnar
+
+
+@pytest.fixture
+def retrieved_data():
+    return {
+        "allRegions": [
+            {
+                "uid": "0x11",
+                "_type": "Region",
+                "name": "Portugal",
+                "area": 92212,
+                "density": 111.5,
+                "borders": [{"uid": "0x12", "_type": "Region", "name": "Spain"}],
+            },
+            {
+                "uid": "0x12",
+                "_type": "Region",
+                "name": "Spain",
+                "area": 505990,
+                "borders": [
+                    {"uid": "0x11", "_type": "Region", "name": "Portugal"},
+                    {"uid": "0x13", "_type": "Region", "name": "Gascony"},
+                ],
+            },
+        ],
+        "map": [
+            {
+                "uid": "0x691",
+                "_type": "Map",
+                "~map": [{"uid": "0x11", "_type": "Region"}],
+            }
+        ],
+    }
+
+
+def declare():
+    class Map(Node):
+        pass
+
+    class Region(Node):
+        name: str
+        area: int
+        density: float
+        borders: List[Region]
+        map: Map = reverse
+
+    return Map, Region
+
+
+def test_hydrate_columns(retrieved_data, monkeypatch):
+    monkeypatch.setattr(columnar, "numpy", None)
+    declare()
+
+    data = hydrate_columns(retrieved_data)
+    regions = data["Region"]
+
+    assert regions["uid"] == array("Q", [0x11, 0x12, 0x13])
+    assert regions["name"] == ["Portugal", "Spain", "Gascony"]
+    # Gascony has no area, so the column cannot be a typed array
+    assert regions["area"] == [92212, 505990, None]
+    assert regions["density"][0] == 111.5
+    assert isinstance(regions["density"], array)
+
+    borders = regions["borders"]
+    assert list(zip(borders.source, borders.target)) == [
+        (0x11, 0x12),
+        (0x12, 0x11),
+        (0x12, 0x13),
+    ]
+
+    assert list(zip(regions["map"].source, regions["map"].target)) == [
+        (0x11, 0x691)
+    ]
+    assert data["Map"]["uid"] == array("Q", [0x691])
+
+
+def test_hydrate_columns_types(retrieved_data):
+    Map, _ = declare()
+
+    data = hydrate_columns(retrieved_data, types=[Map])
+
+    assert list(data) == ["Map"]
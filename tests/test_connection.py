@@ -0,0 +1,125 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import grpc
+import pytest
+
+from pydiggy import connection
+from pydiggy.connection import ClientPool, get_client, get_pool
+
+
+class Unavailable(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+
+def test_get_client_is_pooled():
+    connection.close_pools()
+
+    client = get_client(host="localhost", port=9080)
+    assert get_client(host="localhost", port=9080) is client
+    assert get_client(host="localhost", port=9081) is not client
+    assert client.pool is get_pool("localhost", 9080)
+    assert len(client.pool.stubs) == connection.DEFAULT_POOL_SIZE
+
+    unpooled = get_client(host="localhost", port=9080, pooled=False)
+    assert not isinstance(unpooled, connection.PooledClient)
+
+    connection.close_pools()
+    assert get_client(host="localhost", port=9080) is not client
+    connection.close_pools()
+
+
+def test_pool_selection():
+    pool = ClientPool(size=3)
+    a, b, c = pool.stubs
+
+    # Idle stubs are taken in turn
+    assert [pool.select() for _ in range(4)] == [a, b, c, a]
+
+    # Otherwise, the one with the fewest calls in flight
+    pool._acquire(a)
+    pool._acquire(b)
+    pool._acquire(c)
+    pool._acquire(c)
+    assert {pool.select() for _ in range(3)} == {a, b}
+    pool._release(a)
+    assert pool.client.any_client() is a
+
+    stats = pool.stats()
+    assert (stats.in_flight, stats.requests) == (3, 4)
+    pool.close()
+
+
+def test_pool_ejection():
+    pool = ClientPool(size=2, max_failures=2, eject_seconds=60)
+    a, b = pool.stubs
+
+    for _ in range(2):
+        pool._acquire(a)
+        pool._release(a, Unavailable())
+    assert {pool.select() for _ in range(4)} == {b}
+    assert pool.stats().healthy == 1
+
+    # Errors about the request itself do not count against the stub
+    pool._acquire(b)
+    pool._release(b, ValueError())
+    assert b.failures == 0
+
+    for _ in range(2):
+        pool._acquire(b)
+        pool._release(b, Unavailable())
+
+    # With every stub ejected, the one that comes back first is used
+    assert pool.select() is a
+    assert pool.stats().ejections == 2
+
+    a.ejected_until = 0
+    pool._acquire(a)
+    pool._release(a)
+    assert a.failures == 0
+    assert pool.stats().healthy == 1
+    pool.close()
+
+
+class FakeGrpcStub:
+    def __init__(self, future):
+        self.Query = SimpleNamespace(future=lambda req, **kwargs: future)
+
+    def RunDQL(self, req, **kwargs):
+        return "response"
+
+    def AllocateIDs(self, req, **kwargs):
+        raise Unavailable()
+
+
+def test_pooled_stub_requests():
+    pool = ClientPool(size=1, max_failures=1, eject_seconds=60)
+    (stub,) = pool.stubs
+    future = Future()
+    stub.stub = FakeGrpcStub(future)
+
+    assert stub.run_dql(None) == "response"
+    assert stub.async_query(None) is future
+    assert stub.in_flight == 1
+
+    # Asynchronous calls are in flight until their future is done
+    future.set_exception(Unavailable())
+    assert (stub.in_flight, stub.failures) == (0, 1)
+
+    stub.failures = 0
+    with pytest.raises(Unavailable):
+        stub.allocate_ids(None)
+    assert (stub.in_flight, stub.failures) == (0, 1)
+    assert pool.stats().requests == 3
+    pool.close()
+
+
+def test_pool_after_fork():
+    connection.close_pools()
+    client = get_client()
+
+    connection._forget_pools()
+    assert get_client() is not client
+    client.pool.close()
+    connection.close_pools()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import sys
+from copy import deepcopy
 from typing import List
 
 import pytest
@@ -123,3 +125,68 @@ def test_hydration_reverse(retrieved_data_with_reverse):
 
     assert m.territories
     assert len(m.territories) == 4
+
+
+def test_hydration_identity_map(retrieved_data_simple):
+    class Region(Node):
+        area: int
+        population: int
+        name: str
+        borders: List[Region]
+
+    data = hydrate(retrieved_data_simple)
+    portugal, spain, gascony, marseilles = data["allRegions"]
+
+    assert portugal.borders[0] is spain
+    assert spain.borders[0] is portugal
+    assert gascony.borders[0].obj is spain
+    assert marseilles.borders[0] is spain
+    assert len(spain.borders) == 3
+    assert not spain._dirty
+
+
+def test_hydration_shared_identity_map(retrieved_data_simple):
+    class Region(Node):
+        name: str
+        borders: List[Region]
+
+    identity_map = {}
+    first = hydrate(
+        {"q": [{"uid": "0x12", "_type": "Region", "name": "Spain"}]},
+        identity_map=identity_map,
+    )
+    second = hydrate(retrieved_data_simple, identity_map=identity_map)
+
+    assert first["q"][0] is second["allRegions"][1]
+    assert len(identity_map) == 4
+
+
+def test_hydration_does_not_mutate(retrieved_data_simple):
+    class Region(Node):
+        name: str
+        borders: List[Region]
+
+    control = deepcopy(retrieved_data_simple)
+    hydrate(retrieved_data_simple)
+    hydrate(retrieved_data_simple)
+
+    assert retrieved_data_simple == control
+
+
+def test_hydration_deep_nesting():
+    class Region(Node):
+        name: str
+        borders: List[Region]
+
+    depth = sys.getrecursionlimit() * 2
+    raw = {"uid": hex(depth), "_type": "Region", "name": "Last"}
+    for i in reversed(range(1, depth)):
+        raw = {"uid": hex(i), "_type": "Region", "borders": [raw]}
+
+    data = hydrate({"q": [raw]})
+
+    node = data["q"][0]
+    for _ in range(1, depth):
+        node = node.borders[0]
+    assert node.uid == depth
+    assert node.name == "Last"
@@ -1,6 +1,15 @@
-from pydiggy import Facets, generate_mutation
+import io
+import json
+import re
+from typing import List
 
-# import pytest
+import pytest
+
+from pydiggy import (Deduplicator, Facets, Node, Session, bulk_upsert,
+                     current_session, exact, generate_json_mutation,
+                     generate_mutation, hydrate, index, iter_mutation,
+                     run_mutation, upsert, write_mutation)
+from pydiggy.exceptions import MissingAttribute
 
 
 def test_mutations(RegionClass):
@@ -54,3 +63,522 @@ _:unsaved.1 <borders> _:unsaved.0 ."""  # noqa
 
     pprint.pprint(mutation)
     assert control == mutation
+
+
+def stage_regions(Region):
+    Region._reset()
+
+    por = Region(uid=0x11, name="Portugal")
+    spa = Region(uid=0x12, name="Spain")
+    gas = Region(name="Gascony")
+
+    por.borders = [spa]
+    spa.borders = [por, gas]
+    gas.borders = [Facets(spa, foo="bar")]
+
+    por.stage()
+    spa.stage()
+    gas.stage()
+
+
+def test_iter_mutation(RegionClass):
+    stage_regions(RegionClass)
+    control = generate_mutation()
+
+    stage_regions(RegionClass)
+    lines = iter_mutation()
+    assert next(lines) == '<0x11> <Region> "true" .'
+    assert "\n".join(['<0x11> <Region> "true" .'] + list(lines)) == control
+    assert not current_session().staged
+
+    stage_regions(RegionClass)
+    chunks = list(iter_mutation(chunk_size=64))
+    assert len(chunks) > 1
+    assert all(isinstance(x, bytes) for x in chunks)
+    assert b"".join(chunks).decode() == control + "\n"
+
+
+def test_write_mutation(RegionClass):
+    stage_regions(RegionClass)
+    control = generate_mutation()
+
+    stage_regions(RegionClass)
+    binary = io.BytesIO()
+    assert write_mutation(binary, chunk_size=32) == 13
+    assert binary.getvalue().decode() == control + "\n"
+
+    stage_regions(RegionClass)
+    text = io.StringIO()
+    write_mutation(text)
+    assert text.getvalue() == control + "\n"
+
+
+class FakeResponse:
+    def __init__(self, uids):
+        self.uids = uids
+
+
+class FakeTransaction:
+    def __init__(self, client):
+        self.client = client
+
+    def mutate(self, set_nquads=None, del_nquads=None, mutation=None):
+        if mutation is not None:
+            self.client.mutations.append(mutation)
+            return FakeResponse({})
+        if del_nquads:
+            self.client.deletes.append(del_nquads)
+        self.client.mutations.append(set_nquads)
+        uids = {}
+        for line in set_nquads.split("\n"):
+            subject = line.split(" ", 1)[0]
+            if subject.startswith("_:") and subject[2:] not in uids:
+                self.client.last_uid += 1
+                uids[subject[2:]] = hex(self.client.last_uid)
+        return FakeResponse(uids)
+
+    def commit(self):
+        pass
+
+    def discard(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self):
+        self.mutations = []
+        self.deletes = []
+        self.last_uid = 0x100
+
+    def txn(self):
+        return FakeTransaction(self)
+
+
+def test_run_mutation_batches(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    nodes = [Region(name=f"Region {i}") for i in range(6)]
+    for i, node in enumerate(nodes):
+        node.borders = [nodes[i - 1], nodes[(i + 1) % len(nodes)]]
+        node.stage()
+    mutation = generate_mutation()
+
+    client = FakeClient()
+    reports = []
+    result = run_mutation(
+        mutation, client=client, batch_size=10, on_batch=reports.append
+    )
+
+    assert len(client.mutations) > 1
+    assert result.batches == reports
+    assert [x.index for x in reports] == list(range(len(reports)))
+    assert sum(x.lines for x in reports) == len(mutation.split("\n"))
+    assert len(result.uids) == 6
+
+    # Every label is created once, and references to a label committed in
+    # an earlier batch use its uid
+    sent = "\n".join(client.mutations).split("\n")
+    created = [x.split(" ", 1)[0] for x in sent if "<_type>" in x]
+    assert len(created) == len(set(created)) == 6
+    assert any(x.endswith("<borders> <0x101> .") for x in sent)
+    defined = set()
+    for batch in client.mutations:
+        lines = batch.split("\n")
+        subjects = {x.split(" ", 1)[0] for x in lines}
+        for line in lines:
+            obj = line.split(" ")[2]
+            if obj.startswith("_:"):
+                assert obj in subjects
+                assert obj[2:] not in defined
+        defined.update(x[2:] for x in subjects if x.startswith("_:"))
+
+
+def test_run_mutation_single(RegionClass):
+    stage_regions(RegionClass)
+    mutation = generate_mutation()
+
+    client = FakeClient()
+    result = run_mutation(mutation, client=client)
+
+    assert client.mutations == [mutation]
+    assert set(result.uids) == {"unsaved.0"}
+
+
+def test_run_mutation_workers(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    for i in range(4):
+        left = Region(name=f"Left {i}")
+        right = Region(name=f"Right {i}")
+        left.borders = [right]
+        right.borders = [left]
+        left.stage()
+        right.stage()
+    mutation = generate_mutation()
+
+    clients = [FakeClient(), FakeClient()]
+    clients[1].last_uid = 0x1000
+    result = run_mutation(mutation, client=clients, workers=2, batch_size=8)
+
+    assert len(result.uids) == 8
+    assert [x.index for x in result.batches] == [0, 1, 2, 3]
+    assert all(x.mutations for x in clients)
+
+    # Each pair of regions is committed in the same transaction
+    for client in clients:
+        for batch in client.mutations:
+            lines = batch.split("\n")
+            subjects = {x.split(" ", 1)[0] for x in lines}
+            objects = {x.split(" ")[2] for x in lines if "<borders>" in x}
+            assert objects == subjects
+
+
+def test_json_mutation(RegionClass):
+    stage_regions(RegionClass)
+    mutation = generate_json_mutation()
+
+    assert not current_session().staged
+    assert mutation == [
+        {
+            "uid": "0x11",
+            "Region": True,
+            "_type": "Region",
+            "name": "Portugal",
+            "borders": [{"uid": "0x12"}],
+        },
+        {
+            "uid": "0x12",
+            "Region": True,
+            "_type": "Region",
+            "name": "Spain",
+            "borders": [{"uid": "0x11"}, {"uid": "_:unsaved.0"}],
+        },
+        {
+            "uid": "_:unsaved.0",
+            "Region": True,
+            "_type": "Region",
+            "name": "Gascony",
+            "borders": [{"uid": "0x12", "borders|foo": "bar"}],
+        },
+    ]
+
+    client = FakeClient()
+    run_mutation(mutation, client=client)
+    (sent,) = client.mutations
+    assert json.loads(sent.set_json) == mutation
+
+
+def test_save_json(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    por = Region(uid=0x11)
+    por.name = "Portugal"
+    por.area = 92212
+    por.delete(pred="population")
+
+    client = FakeClient()
+    por.save(client=client, json=True)
+    (sent,) = client.mutations
+    assert json.loads(sent.set_json) == [
+        {"uid": "0x11", "name": "Portugal", "area": 92212}
+    ]
+    assert json.loads(sent.delete_json) == [
+        {"uid": "0x11", "population": None}
+    ]
+
+
+def test_save_all(RegionClass, capsys):
+    Region = RegionClass
+    Region._reset()
+
+    por = Region(uid=0x11)
+    spa = Region(uid=0x12)
+    gas = Region(name="Gascony", borders=[spa])
+    por.name = "Portugal"
+    spa.borders = [por, gas]
+    por.delete(pred="population")
+
+    client = FakeClient()
+    Region.save_all([por, spa, gas], client=client)
+
+    assert capsys.readouterr().out == ""
+    (sent,) = client.mutations
+    assert sorted(sent.split("\n")) == [
+        '<0x11> <name> "Portugal" .',
+        "<0x12> <borders> <0x11> .",
+        "<0x12> <borders> _:unsaved.0 .",
+        '_:unsaved.0 <Region> "true" .',
+        '_:unsaved.0 <_type> "Region" .',
+        "_:unsaved.0 <borders> <0x12> .",
+        '_:unsaved.0 <name> "Gascony" .',
+    ]
+    assert client.deletes == ["<0x11> <population> * ."]
+
+    assert gas.uid == 0x101
+    assert not gas._fresh
+    assert Region._instances[0x101] is gas
+    assert not por._dirty and not por._pending_delete
+    assert Region.save_all([por, spa, gas], client=client) is None
+
+
+def test_session_flush(TypeTestClass):
+    with Session() as session:
+        first = TypeTestClass(str_type="first")
+        second = TypeTestClass(str_type="second", node_type=first)
+        first.stage()
+        second.stage()
+
+        client = FakeClient()
+        session.flush(client=client)
+
+        assert not session.staged
+        assert first.uid == 0x101 and second.uid == 0x102
+
+        # The single node edge of a saved node is replaced in the same
+        # mutation, and only the saved edge is deleted
+        second.node_type = second
+        second.save(client=client)
+        assert client.mutations[-1] == "<0x102> <node_type> <0x102> ."
+        assert client.deletes == ["<0x102> <node_type> <0x101> ."]
+
+        other = TypeTestClass(uid=0x103)
+        other.node_type = first
+        other.save(client=client)
+        assert client.deletes[-1] == "<0x103> <node_type> * ."
+
+
+def test_save_delta(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    data = {
+        "q": [
+            {
+                "uid": "0x1",
+                "_type": "Region",
+                "name": "Portugal",
+                "area": 92212,
+                "borders": [
+                    {"uid": "0x2", "_type": "Region", "name": "Spain"},
+                    {"uid": "0x3", "_type": "Region", "name": "Atlantis"},
+                ],
+            }
+        ]
+    }
+    (por,) = hydrate(data)["q"]
+    spa, atl = por.borders
+
+    client = FakeClient()
+    assert Region.save_all([por, spa, atl], client=client) is None
+
+    gal = Region(uid=0x4)
+    por.borders.append(gal)
+    por.borders.remove(atl)
+    por.name = "Portugal"
+    por.area = 92090
+    por.save(client=client)
+
+    assert sorted(client.mutations[-1].split("\n")) == [
+        '<0x1> <area> "92090"^^<xs:int> .',
+        "<0x1> <borders> <0x4> .",
+    ]
+    assert client.deletes == ["<0x1> <borders> <0x3> ."]
+
+    # The saved values are the new snapshot
+    assert por.save(client=client) is None
+
+
+def test_save_delta_copy_on_write(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    data = {
+        "q": [
+            {
+                "uid": "0x1",
+                "_type": "Region",
+                "name": "Portugal",
+                "borders": [{"uid": "0x2"}, {"uid": "0x3"}],
+            }
+        ]
+    }
+    (por,) = hydrate(data)["q"]
+    spa, atl = por.borders
+
+    # Nothing is copied until something is changed
+    assert por._snapshot_dict is None
+    assert por.borders._original is None
+
+    por.borders.append(Region(uid=0x4))
+    assert por.borders._original == (spa, atl)
+    assert por._snapshot_dict is None
+
+    por.name = "Portugal!"
+    assert por._snapshot_dict == {"name": "Portugal"}
+
+    client = FakeClient()
+    por.save(client=client)
+    assert sorted(client.mutations[-1].split("\n")) == [
+        "<0x1> <borders> <0x4> .",
+        '<0x1> <name> "Portugal!" .',
+    ]
+    assert por.borders._original is None
+    assert por.save(client=client) is None
+
+
+class FakeUpsertClient:
+    def __init__(self, existing):
+        self.existing = existing
+        self.requests = []
+        self.mutations = []
+        self.last_uid = 0x100
+
+    def txn(self):
+        return self
+
+    def mutate(self, set_nquads=None, **kwargs):
+        self.mutations.append(set_nquads)
+
+    def commit(self):
+        pass
+
+    def create_request(self, query=None, mutations=None, commit_now=None):
+        return query, mutations[0].set_nquads.decode()
+
+    def do_request(self, request):
+        self.requests.append(request)
+        query, _ = request
+        found, uids = {}, {}
+        pattern = r'(v\d+) as q\d+\(func: eq\(code, "(\w+)"'
+        for var, code in re.findall(pattern, query):
+            if code in self.existing:
+                found[f"q{var[1:]}"] = [{"uid": self.existing[code]}]
+            else:
+                self.last_uid += 1
+                uids[f"uid({var})"] = self.existing[code] = hex(self.last_uid)
+        return FakeUpsertResponse(json.dumps(found).encode(), uids)
+
+    def discard(self):
+        pass
+
+
+class FakeUpsertResponse:
+    def __init__(self, json, uids):
+        self.json = json
+        self.uids = uids
+
+
+def test_bulk_upsert():
+    class Country(Node):
+        code: str = (index(exact), upsert)
+        name: str
+        neighbours: List["Country"]
+
+    Country._reset()
+    por = Country(code="PT", name="Portugal")
+    spa = Country(code="ES", name="Spain")
+    fra = Country(code="FR", name="France")
+    twin = Country(code="FR", name="France")
+    por.neighbours = [spa]
+    spa.neighbours = [por, fra]
+    fra.neighbours = [spa]
+
+    client = FakeUpsertClient({"ES": "0x5"})
+    result = bulk_upsert([por, spa, fra, twin], client=client, batch_size=3)
+
+    assert [x.index for x in result.batches] == [0, 1]
+    assert (por.uid, spa.uid, fra.uid, twin.uid) == (0x101, 0x5, 0x102, 0x102)
+    assert not por._fresh
+
+    (first_query, first), (second_query, second) = client.requests
+    block = 'v0 as q0(func: eq(code, "PT")) @filter(has(Country))'
+    assert block in first_query
+    assert sorted(first.split("\n")) == [
+        'uid(v0) <Country> "true" .',
+        'uid(v0) <_type> "Country" .',
+        'uid(v0) <code> "PT" .',
+        'uid(v0) <name> "Portugal" .',
+        "uid(v0) <neighbours> uid(v1) .",
+        'uid(v1) <Country> "true" .',
+        'uid(v1) <_type> "Country" .',
+        'uid(v1) <code> "ES" .',
+        'uid(v1) <name> "Spain" .',
+        "uid(v1) <neighbours> uid(v0) .",
+        "uid(v1) <neighbours> uid(v2) .",
+        'uid(v2) <Country> "true" .',
+        'uid(v2) <_type> "Country" .',
+        'uid(v2) <code> "FR" .',
+        'uid(v2) <name> "France" .',
+        "uid(v2) <neighbours> uid(v1) .",
+    ]
+    assert 'eq(code, "FR")' in second_query
+
+    with pytest.raises(MissingAttribute):
+        bulk_upsert([Country(name="Nowhere")], client=client)
+
+
+def test_bulk_upsert_across_batches():
+    class Country(Node):
+        code: str = (index(exact), upsert)
+        neighbours: List["Country"]
+
+    Country._reset()
+    por = Country(code="PT")
+    spa = Country(code="ES")
+    known = Country(uid=0x9, code="FR")
+    por.neighbours = [spa]
+    spa.neighbours = [por]
+    known.neighbours = [spa]
+
+    client = FakeUpsertClient({})
+    bulk_upsert([por, known, spa], client=client, batch_size=2)
+
+    (first_query, first), (second_query, second) = client.requests
+    assert "v0 as q0" in first_query and "v1 as q1" in second_query
+    assert "_:" not in first + second
+    assert "uid(v1) <neighbours> <0x101> ." in second.split("\n")
+
+    # Edges to nodes of later batches are sent once these are committed
+    assert sorted(client.mutations[0].split("\n")) == [
+        "<0x101> <neighbours> <0x102> .",
+        "<0x9> <neighbours> <0x102> .",
+    ]
+    assert (por.uid, spa.uid) == (0x101, 0x102)
+    assert not known._dirty
+
+
+def test_mutation_dedup(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    por = Region(uid=0x11, name="Portugal")
+    same = Region(uid="0x11", name="Portugal")
+    spa = Region(uid="0x12", name="Spain")
+    spa.borders = [por, same, Facets(por, foo="bar")]
+    por.stage()
+    same.stage()
+    spa.stage()
+
+    dedup = Deduplicator()
+    mutation = generate_mutation(dedup=dedup)
+
+    assert mutation.split("\n") == [
+        '<0x11> <Region> "true" .',
+        '<0x11> <_type> "Region" .',
+        '<0x11> <name> "Portugal" .',
+        '<0x12> <Region> "true" .',
+        '<0x12> <_type> "Region" .',
+        '<0x12> <name> "Spain" .',
+        "<0x12> <borders> <0x11> .",
+        '<0x12> <borders> <0x11> (foo="bar") .',
+    ]
+    assert (dedup.kept, dedup.removed) == (8, 4)
+
+    # With a maxsize, only the most recent lines are remembered
+    bounded = Deduplicator(maxsize=2)
+    lines = list(bounded(["a", "b", "a", "c", "a", "c"]))
+    assert lines == ["a", "b", "c", "a"]
+    assert len(bounded.seen) == 2
@@ -1,10 +1,17 @@
 """
 Create a test to make sure that no __annotations__ startswith('_')
 """
-# import pytest
+from __future__ import annotations
+
+import json
+import re
 from pprint import pprint as print
+from typing import List
+
+import pytest
 
-from pydiggy import Facets, Node
+from pydiggy import Facets, Node, reverse
+from pydiggy.exceptions import MissingAttribute
 
 
 def test__node__to__json(RegionClass):
@@ -48,3 +55,116 @@ def test__node__to__json(RegionClass):
     ]
 
     assert regions == control
+
+
+def test__node__annotations__cached(RegionClass):
+    Region = RegionClass
+
+    annotations = Region._get_annotations()
+    assert annotations is Region._get_annotations()
+    assert Region(name="Portugal")._annotations is annotations
+
+    predicates = Region._get_predicates()
+    assert predicates["borders"].prop_type is Region
+    assert predicates["borders"].is_list_type
+    assert not predicates["name"].is_list_type
+
+    class Other(Node):
+        name: str
+
+    assert Region._get_annotations() is not annotations
+    assert Region._get_annotations() == annotations
+
+
+def test__node__compact():
+    class Region(Node, compact=True):
+        name: str
+        area: int
+        borders: List[Region] = reverse(many=True)
+
+    por = Region(uid=0x11, name="Portugal")
+    spa = Region(uid=0x12, name="Spain", area=505990)
+    assert por._dirty_set is None
+
+    por.borders = [spa]
+
+    assert "name" in Region.__slots__
+    assert "borders" in Region.__slots__
+    assert not por.__dict__
+    assert por in spa._borders
+
+    spa.name = "España"
+    assert spa._dirty == {"name"}
+
+    assert por.to_json(max_depth=0) == {
+        "_type": "Region",
+        "uid": 0x11,
+        "name": "Portugal",
+        "borders": "[<Region:18>]",
+    }
+
+    with pytest.raises(MissingAttribute):
+        por.area
+
+    class SubRegion(Region):
+        code: str
+
+    assert SubRegion._compact
+    assert SubRegion.__slots__ == ("code",)
+
+
+class FakeUidClient:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, qry):
+        self.queries.append(qry)
+        uids = re.search(r"uid\(([^)]*)\)", qry).group(1).split(", ")
+        data = {
+            "nodes": [
+                {
+                    "uid": uid,
+                    "_type": "Region",
+                    "name": f"Region {uid}",
+                    "borders": [{"uid": "0x1", "_type": "Region"}],
+                }
+                for uid in uids
+                if uid != "0x63"
+            ]
+        }
+
+        class Response:
+            pass
+
+        response = Response()
+        response.json = json.dumps(data).encode()
+        return response
+
+
+def test__node__get_many(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    client = FakeUidClient()
+
+    uids = [0x3, "0x2", 0x1, 0x63, 0x2, 0x4, 0x5]
+    nodes = Region.get_many(uids, chunk_size=2, workers=2, client=client)
+
+    assert list(nodes) == [0x3, 0x2, 0x1, 0x4, 0x5]
+    assert len(client.queries) == 3
+    assert "uid(0x3, 0x2)) @filter(has(Region))" in client.queries[0]
+    assert nodes[0x2].name == "Region 0x2"
+
+    # Every chunk was hydrated into the same identity map
+    assert nodes[0x3].borders[0] is nodes[0x1]
+    assert nodes[0x5].borders[0] is nodes[0x1]
+
+    assert Region._get_selection(0) == [
+        "uid",
+        "_type",
+        "area",
+        "population",
+        "name",
+        "borders @facets { uid _type }",
+    ]
+    with pytest.raises(ValueError):
+        Region.get_many(["unsaved.0"], client=client)
@@ -1,3 +1,5 @@
+import pytest
+
 from pydiggy import operations
 
 
@@ -11,6 +13,12 @@ def test__parse_subject():
     subject = operations._parse_subject(0x7b)
     assert subject == ("<0x7b>", 123)
 
+    subject = operations._parse_subject("0x7b")
+    assert subject == ("<0x7b>", 123)
+
+    subject = operations._parse_subject("42")
+    assert subject == ("_:42", "42")
+
 
 def test__make_obj(TypeTestClass):
     TypeTestClass._reset()
@@ -31,3 +39,27 @@ def test__make_obj(TypeTestClass):
 
     o = operations._make_obj(node, "node_type", node)
     assert o == "_:unsaved.0"
+
+
+def test__node__serializer(TypeTestClass):
+    TypeTestClass._reset()
+    node = TypeTestClass(int_type=1, str_type="Foo", bool_type=False)
+    node.node_type = node
+    node.stage()
+
+    serializer = TypeTestClass._get_serializer()
+    assert serializer["node_type"] is None
+    assert serializer["int_type"]("2") == '"2"^^<xs:int>'
+    assert TypeTestClass._get_serializer() is serializer
+
+    lines = []
+    node._serialize("_:x", node.edges.items(), node._get_staged(), lines)
+    assert sorted(lines) == [
+        '_:x <bool_type> "false" .',
+        '_:x <int_type> "1"^^<xs:int> .',
+        "_:x <node_type> _:unsaved.0 .",
+        '_:x <str_type> "Foo" .',
+    ]
+
+    with pytest.raises(ValueError):
+        node._serialize("_:x", [("int_type", "abc")], {}, [])
@@ -3,10 +3,13 @@
 
 """Tests for `pydiggy` package."""
 
+import gzip
+
 import pytest
 from click.testing import CliRunner
 
 from pydiggy import Node, cli
+from pydiggy.operations import export_rdf
 
 
 @pytest.fixture
@@ -34,3 +37,43 @@ def test_dry_run_generate_schema(runner):
     assert "borders: uid ." in result.output
     assert "name: string ." in result.output
     assert "population: int ." in result.output
+
+
+def test_export_rdf(runner, tmp_path):
+    result = runner.invoke(
+        cli.main,
+        [
+            "export-rdf",
+            "tests.fakeapp",
+            "--generator",
+            "regions",
+            "--shard-size",
+            "8",
+            "--out",
+            str(tmp_path),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "Done. 19 lines in 3 files" in result.output
+
+    shards = sorted(tmp_path.glob("pydiggy-*.rdf.gz"))
+    assert len(shards) == 3
+    lines = [
+        line
+        for shard in shards
+        for line in gzip.decompress(shard.read_bytes()).decode().splitlines()
+    ]
+    assert len(lines) == 19
+    assert sum("<borders> _:unsaved." in line for line in lines) == 4
+    assert "Region: bool @index(bool) ." in (
+        tmp_path / "pydiggy.schema"
+    ).read_text()
+
+
+def test_export_rdf_unstaged(tmp_path):
+    from tests.fakeapp.basic import regions
+
+    nodes = list(regions())
+    reports = export_rdf(str(tmp_path), nodes, schema=False)
+    assert [x.lines for x in reports] == [19]
+    assert all(x.uid not in Node._get_staged() for x in nodes)
@@ -0,0 +1,96 @@
+import gc
+
+import pytest
+
+from pydiggy import Node, Session, hydrate
+from pydiggy.registry import InstanceRegistry
+
+
+def test_registry_weak(RegionClass):
+    Region = RegionClass
+    Region._reset()
+
+    por = Region(uid=0x11, name="Portugal")
+    Region(uid=0x12, name="Spain")
+    gc.collect()
+
+    assert Region._instances.mode == "weak"
+    assert list(Region._instances) == [0x11]
+    assert Region._instances.get(0x11) is por
+    assert Region._instances.get(0x12) is None
+    assert list(Node.json()["Region"]) == [
+        {"_type": "Region", "uid": 0x11, "name": "Portugal"}
+    ]
+
+    stats = Node.registry_stats()["Region"]
+    assert (stats.size, stats.hits, stats.misses) == (1, 1, 1)
+
+
+def test_registry_lru():
+    registry = InstanceRegistry("lru", maxsize=2)
+    registry[1] = "a"
+    registry[2] = "b"
+    registry[1]
+    registry[3] = "c"
+
+    assert list(registry) == [1, 3]
+    assert registry.stats().evictions == 1
+
+
+def test_registry_disabled():
+    registry = InstanceRegistry("disabled")
+    registry[1] = "a"
+
+    assert len(registry) == 0
+
+
+def test_registry_invalid():
+    with pytest.raises(ValueError):
+        InstanceRegistry("nope")
+
+    with pytest.raises(ValueError):
+        InstanceRegistry("lru")
+
+
+def test_configure_registry(RegionClass):
+    Region = RegionClass
+    try:
+        Node.configure_registry("lru", maxsize=1)
+        Region(uid=0x11)
+        spa = Region(uid=0x12)
+
+        assert Region._instances.mode == "lru"
+        assert list(Region._instances.values()) == [spa]
+
+        class Other(Node):
+            pass
+
+        assert Other._instances.mode == "lru"
+    finally:
+        Node.configure_registry()
+    assert Region._instances.mode == "weak"
+
+
+def test_registry_hydration_stats(RegionClass):
+    Region = RegionClass
+    Region._reset()
+    data = {"q": [{"uid": "0x11", "_type": "Region", "name": "Portugal"}]}
+
+    por = hydrate(data)["q"][0]
+    stats = Region._instances.stats()
+    assert (stats.hits, stats.misses) == (0, 1)
+
+    # Without an identity map, every hydration creates its own instance
+    assert hydrate(data)["q"][0] is not por
+    assert Region._instances.stats().hits == 0
+
+    # A uid found twice in one response is reused
+    first, second = hydrate({"q": data["q"] * 2})["q"]
+    assert first is second
+    stats = Region._instances.stats()
+    assert (stats.hits, stats.misses) == (1, 3)
+
+    with Session():
+        first = hydrate(data)["q"][0]
+        assert hydrate(data)["q"][0] is first
+    assert Region._instances.stats().hits == 2
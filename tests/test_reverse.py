@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from copy import copy
 from typing import List
 
 from pydiggy import Node, reverse
@@ -69,3 +70,82 @@ def test_reverse_name_many():
 
     assert c1 in p.children
     assert c2 in p.children
+
+
+def test_reverse_reassign_many():
+    class Person(Node):
+        parent: Person = reverse(name="children", many=True)
+
+    p1 = Person()
+    p2 = Person()
+    c = Person()
+
+    c.parent = p1
+    c.parent = p1
+    assert len(p1.children) == 1
+
+    c.parent = p2
+    assert c not in p1.children
+    assert c in p2.children
+
+    c.parent = None
+    assert len(p2.children) == 0
+
+
+def test_reverse_reassign_list():
+    class Region(Node):
+        borders: List[Region] = reverse(many=True)
+
+    por = Region(uid=0x11)
+    spa = Region(uid=0x12)
+    gas = Region(uid=0x13)
+
+    por.borders = [spa, gas]
+    por.borders = [gas]
+
+    assert por not in spa._borders
+    assert por in gas._borders
+    assert list(gas._borders) == [por]
+    assert not spa._dirty
+
+
+def test_reverse_single_unset():
+    class Person(Node):
+        parent: Person = reverse(name="child")
+
+    p = Person()
+    c = Person()
+
+    c.parent = p
+    c.parent = None
+
+    assert not hasattr(p, "child")
+
+
+def test_reverse_edges_list():
+    class Person(Node):
+        parent: Person = reverse(name="children", many=True)
+
+    p = Person()
+    children = [Person() for _ in range(4)]
+    for child in children:
+        child.parent = p
+
+    assert isinstance(p.children, list)
+    assert p.children[0] is children[0]
+    assert p.children[-1] is children[-1]
+    assert p.children == children
+
+    children[1].parent = None
+    assert p.children[1] is children[3]
+    assert len(p.children) == 3 and children[1] not in p.children
+
+    p.children.insert(0, children[1])
+    p.children.remove(children[0])
+    assert children[0] not in p.children
+    assert set(map(id, p.children)) == set(map(id, children[1:]))
+
+    copied = copy(p.children)
+    assert copied == p.children
+    copied.discard(children[2])
+    assert children[2] in p.children
@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pydiggy import Session, current_session, generate_mutation, hydrate
+
+
+def build(Region, name, size):
+    with Session() as session:
+        nodes = [Region(name=f"{name} {i}") for i in range(size)]
+        for node in nodes:
+            node.stage()
+        mutation = generate_mutation()
+        assert not session.staged
+    return nodes, mutation
+
+
+def test_session_scope(RegionClass):
+    Region = RegionClass
+    default = current_session()
+
+    with Session() as session:
+        assert current_session() is session
+        por = Region(name="Portugal")
+        por.stage()
+        assert por.uid == f"{session.prefix}.0"
+        assert por.uid != default.next_uid()
+        assert list(session.staged.values()) == [por]
+
+        with Session() as inner:
+            assert current_session() is inner
+            assert Region(name="Spain").uid == f"{inner.prefix}.0"
+            assert inner.prefix != session.prefix
+        assert current_session() is session
+
+    assert current_session() is default
+    assert all(x is not por for x in default.staged.values())
+
+
+def test_session_threads(RegionClass):
+    Region = RegionClass
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(build, Region, f"Region {i}", 50)
+            for i in range(16)
+        ]
+        results = [f.result() for f in futures]
+
+    assert len({nodes[0].uid for nodes, _ in results}) == 16
+    for i, (nodes, mutation) in enumerate(results):
+        lines = mutation.split("\n")
+        assert len(lines) == 150
+        prefix = nodes[0].uid.rsplit(".", 1)[0]
+        assert [x.uid for x in nodes] == [f"{prefix}.{x}" for x in range(50)]
+        assert all(f"Region {i} " in x for x in lines if "<name>" in x)
+
+
+def test_session_tasks(RegionClass):
+    Region = RegionClass
+
+    async def task(name):
+        await asyncio.sleep(0)
+        return build(Region, name, 10)
+
+    async def main():
+        return await asyncio.gather(*(task(f"R{i}") for i in range(10)))
+
+    for nodes, mutation in asyncio.run(main()):
+        assert len(mutation.split("\n")) == 30
+
+
+def test_session_identity_map(RegionClass):
+    data = {"q": [{"uid": "0x11", "_type": "Region", "name": "Portugal"}]}
+
+    assert hydrate(data)["q"][0] is not hydrate(data)["q"][0]
+
+    with Session() as session:
+        assert hydrate(data)["q"][0] is hydrate(data)["q"][0]
+        assert 0x11 in session.identity_map
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import List
+
+import pytest
+
+from pydiggy import Node, hydrate_stream
+from pydiggy.exceptions import InvalidData
+from pydiggy.stream import iter_blocks
+
+
+@pytest.fixture
+def response():
+    return {
+        "allRegions": [
+            {
+                "uid": "0x11",
+                "_type": "Region",
+                "name": "Portugal ✓",
+                "area": 92_212,
+                "borders": [{"uid": "0x12", "_type": "Region", "name": "Spain"}],
+            },
+            {"uid": "0x12", "_type": "Region", "name": "Spain", "area": 5e5},
+        ],
+        "empty": [],
+        "count": 2,
+        "other": [{"uid": "0x13", "_type": "Region", "name": "Gascony"}],
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_iter_blocks(response, chunk_size):
+    raw = json.dumps(response, ensure_ascii=False).encode("utf-8")
+    items = list(iter_blocks(io.BytesIO(raw), chunk_size=chunk_size))
+
+    control = [
+        (name, item)
+        for name, block in response.items()
+        if isinstance(block, list)
+        for item in block
+    ]
+    assert items == control
+
+
+def test_iter_blocks_invalid():
+    with pytest.raises(InvalidData):
+        list(iter_blocks(b'{"q": [{"uid": "0x1"}', chunk_size=4))
+
+    with pytest.raises(InvalidData):
+        list(iter_blocks(b'["q"]'))
+
+    assert list(iter_blocks(b"{}")) == []
+
+
+def test_hydrate_stream(response):
+    class Region(Node):
+        area: int
+        name: str
+        borders: List[Region]
+
+    raw = json.dumps(response).encode("utf-8")
+    items = list(hydrate_stream(raw, chunk_size=16))
+
+    assert [name for name, _ in items] == ["allRegions", "allRegions", "other"]
+    assert [node.uid for _, node in items] == [0x11, 0x12, 0x13]
+    assert items[0][1].borders[0].name == "Spain"
+    assert items[0][1].borders[0] is not items[1][1]